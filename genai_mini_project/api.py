@@ -0,0 +1,91 @@
+"""Async HTTP API for ingestion and question answering.
+
+Run with: uvicorn api:app --workers 4   (or: python cli.py serve)
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from pydantic import BaseModel
+import service
+
+# Blocking work (scraping, embedding, Supabase, Gemini) runs on a bounded thread pool
+MAX_WORKERS = int(os.getenv("JSCRAP_MAX_WORKERS", "4"))
+# Requests allowed to wait for a worker before new ones are rejected with 503
+MAX_PENDING = int(os.getenv("JSCRAP_MAX_PENDING", "32"))
+# Questions per /ask/batch request, so one request cannot hold a worker indefinitely
+MAX_BATCH = int(os.getenv("JSCRAP_MAX_BATCH", "16"))
+# Ingests wait on a host-wide lock (service.ingest_lock), so they get their own single
+# worker and a short queue instead of tying up the workers that answer questions
+MAX_PENDING_INGESTS = int(os.getenv("JSCRAP_MAX_PENDING_INGESTS", "2"))
+
+app = FastAPI(title="J-Scrap API")
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+pending = asyncio.Semaphore(MAX_WORKERS + MAX_PENDING)
+ingest_executor = ThreadPoolExecutor(max_workers=1)
+ingest_pending = asyncio.Semaphore(1 + MAX_PENDING_INGESTS)
+
+class UrlRequest(BaseModel):
+    url: str
+
+class AskRequest(BaseModel):
+    question: str
+    top_k: int = 20
+    session_id: str | None = None
+
+class AskBatchRequest(BaseModel):
+    questions: list[str]
+    top_k: int = 20
+
+@asynccontextmanager
+async def reserve(slots):
+    """Holds one of the slots for the request, rejecting it with 503 when none is free."""
+    if slots.locked():
+        raise HTTPException(status_code=503, detail="Server busy, retry later.", headers={"Retry-After": "1"})
+    async with slots:
+        yield
+
+async def run_blocking(func, *args, pool=executor, slots=pending):
+    """Runs a blocking service call on a worker pool, applying backpressure."""
+    async with reserve(slots):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, functools.partial(func, *args))
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
+
+@app.post("/ingest/url")
+async def ingest_url(request: UrlRequest):
+    if not request.url:
+        raise HTTPException(status_code=400, detail="Please enter a valid URL.")
+    return await run_blocking(service.ingest_url, request.url, pool=ingest_executor, slots=ingest_pending)
+
+@app.post("/ingest/pdf")
+async def ingest_pdf(file: UploadFile = File(...)):
+    async with reserve(ingest_pending):  # Before reading, so a rejected upload is never loaded into memory
+        data = await file.read()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(ingest_executor, functools.partial(service.ingest_pdf, data, file.filename))
+
+@app.post("/ask")
+async def ask(request: AskRequest):
+    if not request.question:
+        raise HTTPException(status_code=400, detail="Please enter a question.")
+    return await run_blocking(service.ask, request.question, request.top_k, request.session_id)
+
+@app.get("/sessions/{session_id}/stats")
+async def session_stats(session_id: str):
+    stats = service.session_stats(session_id)
+    if stats is None:
+        raise HTTPException(status_code=404, detail="Unknown session.")
+    return stats
+
+@app.post("/ask/batch")
+async def ask_batch(request: AskBatchRequest):
+    if len(request.questions) > MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH} questions per batch.")
+    return await run_blocking(service.ask_batch, request.questions, request.top_k)
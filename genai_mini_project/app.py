@@ -1,7 +1,7 @@
+import uuid
 import streamlit as st
-from scrap import scrape_website
-from pdf import search_supabase, store_in_supabase, extract_text_from_pdf
-from llm import get_gemini_response
+import client
+from history import HistoryStore, user_key
 
 def set_bg():
     """Sets custom background styling."""
@@ -52,17 +52,19 @@ def set_bg():
 
 def initialize_session_state():
     """Initializes session state variables."""
-    if "questions" not in st.session_state:
-        st.session_state.questions = []
-    if "answers" not in st.session_state:
-        st.session_state.answers = []
+    if "user_id" not in st.session_state:
+        st.session_state.user_id = user_key(st.query_params)  # Keys this user's history across reloads
+    if "history" not in st.session_state:
+        st.session_state.history = HistoryStore(f"history:{st.session_state.user_id}")
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = str(uuid.uuid4())  # Conversation id for follow-up retrieval
     if "current_mode" not in st.session_state:
         st.session_state.current_mode = "Web URL"  # Default mode
 
 def clear_history():
     """Clears stored questions and answers."""
-    st.session_state.questions = []
-    st.session_state.answers = []
+    st.session_state.history.clear()
+    st.session_state.session_id = str(uuid.uuid4())
     st.success("Chat history cleared!")
 
 def main():
@@ -78,8 +80,8 @@ def main():
     if option != st.session_state.current_mode:
         st.session_state.current_mode = option
         # clear_history()
-        st.session_state.questions = []
-        st.session_state.answers = []
+        st.session_state.history.clear()
+        st.session_state.session_id = str(uuid.uuid4())
 
     if option == "Web URL":
         handle_web_url()
@@ -94,8 +96,8 @@ def handle_web_url():
     if st.button("🕵️‍♂️ Scrape Webpage"):
         if url:
             st.success(f"🔄 Scraping started for: {url}")
-            scraped_text = scrape_website(url)
-            store_in_supabase(scraped_text, url)
+            client.ingest_url(url)
+            st.session_state.session_id = str(uuid.uuid4())  # Cached chunks belong to the replaced corpus
         else:
             st.error("❌ Please enter a valid URL.")
 
@@ -108,10 +110,13 @@ def handle_pdf_upload():
     
     if uploaded_file is not None:
         st.success("📄 PDF uploaded successfully!")
-        with st.spinner("Processing PDF..."):
-            text = extract_text_from_pdf(uploaded_file)
-            store_in_supabase(text, uploaded_file.name)
-            st.success("PDF text extracted and stored in Supabase!")
+        upload = (uploaded_file.name, uploaded_file.size)
+        if st.session_state.get("ingested_pdf") != upload:  # Streamlit reruns this on every interaction
+            with st.spinner("Processing PDF..."):
+                client.ingest_pdf(uploaded_file.getvalue(), uploaded_file.name)
+            st.session_state.ingested_pdf = upload
+            st.session_state.session_id = str(uuid.uuid4())  # Cached chunks belong to the replaced corpus
+        st.success("PDF text extracted and stored in Supabase!")
 
     handle_question_answering()
 
@@ -128,15 +133,11 @@ def handle_question_answering():
     
     if submit_pressed:
         if user_question:
-            with st.spinner("Searching relevant context..."):
-                result = search_supabase(user_question)
-                question, contexts = result["question"], result["contexts"]
+            with st.spinner("Searching relevant context and generating answer..."):
+                result = client.ask(user_question, session_id=st.session_state.session_id)
+                question, response = result["question"], result["answer"]
             
-            with st.spinner("Generating answer..."):
-                response = get_gemini_response(question, contexts)
-            
-            st.session_state.questions.insert(0, question)
-            st.session_state.answers.insert(0, response)
+            st.session_state.history.add(question, response)
             
             st.write(f"🤔 *You asked:* {question}")
             st.write(f"📝 *Answer:* {response}")
@@ -146,12 +147,20 @@ def handle_question_answering():
     if clear_pressed:
         clear_history()
     
-    if st.session_state.questions:
-        st.subheader("📜 Previous Questions")
-        for q, a in zip(st.session_state.questions, st.session_state.answers):
-            st.write(f"**Q:** {q}")
-            st.write(f"**A:** {a}")
-            st.write("---")
+    if len(st.session_state.history):
+        display_history(st.session_state.history)
+
+def display_history(history, page_size=10):
+    """Displays previous questions and answers one page at a time."""
+    st.subheader("📜 Previous Questions")
+    pages = history.page_count(page_size)
+    page = 1
+    if pages > 1:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, key=f"{history.key}_page")
+    for q, a in history.page(page - 1, page_size):
+        st.write(f"**Q:** {q}")
+        st.write(f"**A:** {a}")
+        st.write("---")
 
 if __name__ == "__main__":
     main()
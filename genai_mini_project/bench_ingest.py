@@ -0,0 +1,117 @@
+"""Peak-RSS regression check for the ingestion pipeline.
+
+Feeds generated inputs of increasing size through ingest.ingest_chunks, each in a
+fresh process, with a stand-in encoder (random 384-d float32 vectors) and a writer
+that serializes and discards rows. Dedup runs as in production, so the signature
+index (~33 bytes per stored chunk) is part of the measurement. Peak memory above the
+process baseline must stay flat as the input grows; the script exits with status 1
+when it does not.
+
+    python bench_ingest.py --sizes 10 50 200 --max-memory-mb 64
+    python bench_ingest.py --sizes 1 2 4 --pdf   # through pdf_extract.extract_pages
+
+With --pdf the parent first writes the pages into a PDF file; the child loads its
+bytes before taking the baseline (an upload is held in memory anyway) and extracts
+it page by page.
+"""
+
+import argparse
+import json
+import random
+import resource
+import os
+import subprocess
+import sys
+import tempfile
+import numpy as np
+
+WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt".split()
+
+def current_rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+def generated_pages(size_mb, page_chars=4000):
+    """Yields pages of random words until size_mb of text has been produced."""
+    rng = random.Random(0)
+    for _ in range(size_mb * 2**20 // page_chars):
+        yield " ".join(rng.choice(WORDS) + str(rng.randrange(10**6)) for _ in range(page_chars // 12))[:page_chars]
+
+def generated_pdf(size_mb):
+    """Returns the bytes of a compressed PDF holding generated_pages(size_mb)."""
+    import fitz
+    doc = fitz.open()
+    for text in generated_pages(size_mb):
+        doc.new_page().insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=4)
+    return doc.tobytes(deflate=True, garbage=1)
+
+def child(size_mb, max_memory_mb, dedup, pdf_path):
+    import ingest
+
+    rng = np.random.default_rng(0)
+    pages = generated_pages(size_mb)
+    if pdf_path:
+        os.environ["JSCRAP_PAGE_CACHE"] = os.path.join(os.path.dirname(pdf_path), "page_cache.sqlite")
+        from pdf_extract import extract_pages
+        with open(pdf_path, "rb") as f:
+            pages = (page + "\n" for page in extract_pages(f.read()))
+    baseline = current_rss_mb()
+    written = 0
+
+    def write(rows):
+        nonlocal written
+        written += len(json.dumps(rows))
+
+    stats = ingest.ingest_chunks(
+        ingest.iter_chunks(pages), "bench",
+        lambda chunks: rng.standard_normal((len(chunks), 384), dtype=np.float32),
+        write, max_memory_mb, dedup=dedup,
+    )
+    print(json.dumps({"size_mb": size_mb, "chunks": stats["chunks_stored"],
+                      "baseline_mb": baseline, "peak_mb": peak_rss_mb(), "written_mb": written / 2**20}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200], help="Input sizes in MB")
+    parser.add_argument("--max-memory-mb", type=int, default=64)
+    parser.add_argument("--tolerance-mb", type=float, default=32, help="Allowed growth of peak over the smallest input")
+    parser.add_argument("--no-dedup", dest="dedup", action="store_false", help="Skip the dedup stage")
+    parser.add_argument("--pdf", action="store_true", help="Feed the input through a generated PDF and extract_pages")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--pdf-path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        return child(args.child, args.max_memory_mb, args.dedup, args.pdf_path)
+
+    results = []
+    for size in args.sizes:
+        pdf_args = []
+        if args.pdf:
+            pdf_path = os.path.join(tempfile.mkdtemp(), "bench.pdf")
+            with open(pdf_path, "wb") as f:
+                f.write(generated_pdf(size))
+            pdf_args = ["--pdf-path", pdf_path]
+        output = subprocess.run(
+            [sys.executable, __file__, "--child", str(size), "--max-memory-mb", str(args.max_memory_mb)]
+            + ([] if args.dedup else ["--no-dedup"]) + pdf_args,
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result["growth_mb"] = result["peak_mb"] - result["baseline_mb"]
+        results.append(result)
+        print(f"{size:>6} MB input: {result['chunks']:>8} chunks, peak {result['peak_mb']:.1f} MB "
+              f"(+{result['growth_mb']:.1f} MB over baseline)")
+
+    allowed = results[0]["growth_mb"] + args.tolerance_mb
+    worst = max(result["growth_mb"] for result in results)
+    if worst > allowed:
+        print(f"❌ Peak memory grows with input size: +{worst:.1f} MB > {allowed:.1f} MB allowed")
+        sys.exit(1)
+    print(f"✅ Peak memory stays bounded (+{worst:.1f} MB <= {allowed:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmarks CompressedIndex settings for memory, query latency and recall@k.
+
+    python bench_quantize.py                      # synthetic fixture corpus
+    python bench_quantize.py --text corpus.txt    # embed a text file with all-MiniLM-L6-v2
+    python bench_quantize.py --npy vectors.npy    # precomputed (n, 384) float32 embeddings
+
+Compressed indexes rescore from an np.memmap of the full vectors, as LocalIndex does
+with .arrow snapshots, so "RAM MB" is what they really hold in memory and "mmap MB"
+the file they read candidates from (through the page cache, warm after the first
+queries).
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from quantize import CompressedIndex, normalize
+
+CONFIGS = [
+    ("float32 exact", None),
+    ("int8", dict(dims=384, reduction=None, quantization="int8")),
+    ("pca128+int8", dict(dims=128, reduction="pca", quantization="int8")),
+    ("pca64+int8", dict(dims=64, reduction="pca", quantization="int8")),
+    ("truncate128+int8", dict(dims=128, reduction="truncate", quantization="int8")),
+    ("binary", dict(dims=384, reduction=None, quantization="binary")),
+    ("pca256+binary", dict(dims=256, reduction="pca", quantization="binary")),
+]
+
+def fixture_corpus(count, dims=384, seed=0):
+    """Clustered vectors with a decaying variance spectrum, roughly like sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    spectrum = 1.0 / np.sqrt(np.arange(1, dims + 1))
+    centers = rng.normal(size=(max(10, count // 200), dims)) * spectrum
+    vectors = centers[rng.integers(0, len(centers), count)] + 0.5 * rng.normal(size=(count, dims)) * spectrum
+    return normalize(vectors)
+
+def text_corpus(path):
+    from sentence_transformers import SentenceTransformer
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    chunks = [text[i:i+1000] for i in range(0, len(text), 1000)]
+    return normalize(SentenceTransformer("all-MiniLM-L6-v2").encode(chunks))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--text")
+    parser.add_argument("--npy")
+    parser.add_argument("--count", type=int, default=100000, help="Synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=20)
+    parser.add_argument("--rescore", type=int, nargs="+", default=[1, 4, 10])
+    args = parser.parse_args()
+
+    if args.npy:
+        vectors = normalize(np.load(args.npy))
+    elif args.text:
+        vectors = text_corpus(args.text)
+    else:
+        vectors = fixture_corpus(args.count)
+    rng = np.random.default_rng(1)
+    # Queries are perturbed corpus vectors so each has genuine near neighbours
+    queries = normalize(vectors[rng.integers(0, len(vectors), args.queries)]
+                        + 0.05 * rng.normal(size=(args.queries, vectors.shape[1])))
+    k = min(args.k, len(vectors))
+    truth = [set(np.argpartition(-(vectors @ q), k - 1)[:k]) for q in queries]
+    mmap_path = os.path.join(tempfile.mkdtemp(), "vectors.npy")
+    np.save(mmap_path, vectors.astype(np.float32))
+    on_disk = np.load(mmap_path, mmap_mode="r")
+
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={k}")
+    print(f"{'config':<18}{'rescore':>8}{'RAM MB':>10}{'mmap MB':>9}{'build s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'recall@k':>10}")
+    for name, config in CONFIGS:
+        for rescore in ([None] if config is None else args.rescore):
+            start = time.perf_counter()
+            if config is None:
+                memory, mapped = vectors.nbytes, 0
+                search = lambda q: [(i, None) for i in np.argpartition(-(vectors @ q), k - 1)[:k]]
+            else:
+                index = CompressedIndex(rescore=rescore, **config).build(on_disk)
+                memory, mapped = index.memory_bytes(), on_disk.nbytes
+                search = lambda q: index.search(q, k)
+            build = time.perf_counter() - start
+
+            latencies, recalls = [], []
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                found = {i for i, _ in search(query)}
+                latencies.append((time.perf_counter() - start) * 1000)
+                recalls.append(len(found & expected) / k)
+            p50, p95 = np.percentile(latencies, [50, 95])
+            print(f"{name:<18}{rescore or '-':>8}{memory / 2**20:>10.1f}{mapped / 2**20:>9.1f}{build:>9.2f}"
+                  f"{p50:>9.2f}{p95:>9.2f}{np.mean(recalls):>10.3f}")
+    del on_disk
+    os.remove(mmap_path)
+
+if __name__ == "__main__":
+    main()
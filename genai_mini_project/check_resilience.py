@@ -0,0 +1,117 @@
+"""Drives resilience.py against the fault-injecting mock (mock_supabase.py).
+
+Each scenario switches the mock's faults, runs real supabase-py calls through the
+retry/deadline/breaker/hedging layer and checks the outcome; the script exits
+with status 1 when any check fails.
+
+    python check_resilience.py
+"""
+
+import sys
+import time
+import numpy as np
+from supabase import create_client
+from mock_supabase import start_mock_server
+from resilience import (
+    CircuitBreaker, CircuitOpenError, Deadline, call_with_retries, enforce_deadlines, hedged,
+)
+
+EMBEDDING = [0.1] * 8
+
+def set_faults(store, **faults):
+    store.faults.update(
+        dict(latency=0.0, jitter=0.0, error_rate=0.0, disconnect_rate=0.0, outage=False, slow_every=0, slow_latency=0.0),
+        **faults,
+    )
+
+def insert(client, text):
+    return client.table("documents").insert([{"doc_id": "check", "text": text, "embedding": str(EMBEDDING)}]).execute()
+
+def search(client):
+    return client.rpc("match_documents", {"query_embedding": EMBEDDING, "match_count": 1}).execute()
+
+def check_retries(client, store):
+    """Transient 503s and dropped connections are retried until the call succeeds."""
+    set_faults(store, error_rate=0.3, disconnect_rate=0.1)
+    breaker = CircuitBreaker(failure_threshold=100)
+    before = store.requests
+    for n in range(20):
+        call_with_retries(lambda: insert(client, f"row {n}"), retries=8, backoff=0.01, breaker=breaker)
+    return True, f"20 inserts succeeded in {store.requests - before} requests"
+
+def check_insert_not_repeated(client, store):
+    """An insert whose connection dropped may have been applied, so it is not sent again."""
+    set_faults(store, disconnect_rate=1.0)
+    before = store.requests
+    try:
+        call_with_retries(lambda: insert(client, "once"), backoff=0.01, breaker=CircuitBreaker(), idempotent=False)
+        return False, "insert unexpectedly succeeded"
+    except Exception as e:
+        sent = store.requests - before
+        return sent == 1, f"sent {sent} time(s), then raised {e.__class__.__name__}"
+
+def check_deadline(client, store):
+    """A hung request gives up at the deadline instead of the client's 120 s timeout."""
+    set_faults(store, latency=5.0)
+    start = time.perf_counter()
+    try:
+        call_with_retries(lambda: insert(client, "slow"), deadline=Deadline(1.0), breaker=CircuitBreaker())
+        return False, "insert unexpectedly succeeded"
+    except Exception as e:
+        elapsed = time.perf_counter() - start
+        return elapsed < 1.5, f"gave up after {elapsed:.2f}s with {e.__class__.__name__}"
+
+def check_breaker(client, store):
+    """An outage opens the circuit, open calls fail fast, and a healthy trial call closes it."""
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.5)
+    set_faults(store, outage=True)
+    for _ in range(3):
+        try:
+            call_with_retries(lambda: search(client), retries=1, breaker=breaker)
+        except Exception:
+            pass
+    before = store.requests
+    try:
+        call_with_retries(lambda: search(client), breaker=breaker)
+        return False, "call went through an open circuit"
+    except CircuitOpenError:
+        pass
+    if store.requests != before:
+        return False, "open circuit still reached the backend"
+    set_faults(store)
+    time.sleep(0.6)
+    call_with_retries(lambda: search(client), breaker=breaker)
+    return breaker.state == "closed", f"opened after 3 failures, failed fast, then {breaker.state} after recovery"
+
+def check_hedging(client, store):
+    """With every other request stalled, hedged searches stay fast while plain ones do not."""
+    set_faults(store, slow_every=2, slow_latency=2.0)
+    plain, hedged_latency = [], []
+    runs = ((plain, lambda: search(client)), (hedged_latency, lambda: hedged(lambda: search(client), 0.1, Deadline(3.0))))
+    for latencies, run in runs:
+        for _ in range(6):
+            start = time.perf_counter()
+            run()
+            latencies.append(time.perf_counter() - start)
+    p_plain, p_hedged = np.percentile(plain, 90), np.percentile(hedged_latency, 90)
+    return p_hedged < 0.5 < p_plain, f"p90 {p_plain * 1000:.0f} ms plain vs {p_hedged * 1000:.0f} ms hedged"
+
+def main():
+    server, store = start_mock_server()
+    client = create_client(f"http://127.0.0.1:{server.server_address[1]}", "mock.mock.mock")
+    enforce_deadlines(client)
+
+    failed = 0
+    for check in (check_retries, check_insert_not_repeated, check_deadline, check_breaker, check_hedging):
+        try:
+            ok, detail = check(client, store)
+        except Exception as e:
+            ok, detail = False, f"raised {e.__class__.__name__}: {e}"
+        failed += not ok
+        print(f"{'✅' if ok else '❌'} {check.__name__[6:]}: {detail}")
+    set_faults(store)
+    server.shutdown()
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
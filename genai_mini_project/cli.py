@@ -0,0 +1,90 @@
+"""Command line entry point for J-Scrap without Streamlit."""
+
+import argparse
+import json
+import os
+
+def cmd_ingest_url(args):
+    import service
+    for url in args.urls:
+        print(f"Scraping {url}...")
+        print(json.dumps(service.ingest_url(url)))
+
+def cmd_ingest_pdf(args):
+    import service
+    with open(args.path, "rb") as f:
+        print(json.dumps(service.ingest_pdf(f.read(), os.path.basename(args.path))))
+
+def cmd_ask(args):
+    import service
+    for result in service.ask_batch(args.questions, args.top_k):
+        print(f"🤔 You asked: {result['question']}")
+        print(f"📝 Answer: {result['answer']}")
+
+def cmd_crawl(args):
+    import crawl
+    crawl.run_scheduler(args.urls_file, args.interval, args.once)
+
+def cmd_export(args):
+    import snapshot
+    print(f"✅ Exported {snapshot.export_snapshot(args.path, args.doc_id)} rows to {args.path}")
+
+def cmd_import(args):
+    import snapshot
+    if args.local:
+        index = snapshot.LocalIndex(args.path)
+        print(f"✅ Loaded {len(index.vectors)} vectors, {index.index.memory_bytes() / 2**20:.1f} MB in RAM")
+        return
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    print(f"✅ Imported {snapshot.import_snapshot(args.path)} rows from {args.path}")
+
+def cmd_serve(args):
+    import uvicorn
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="J-Scrap: AI-Powered Insights from Web & PDFs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("ingest-url", help="Scrape websites and store them")
+    p.add_argument("urls", nargs="+")
+    p.set_defaults(func=cmd_ingest_url)
+
+    p = commands.add_parser("ingest-pdf", help="Extract a PDF and store it")
+    p.add_argument("path")
+    p.set_defaults(func=cmd_ingest_pdf)
+
+    p = commands.add_parser("ask", help="Answer one or more questions")
+    p.add_argument("questions", nargs="+")
+    p.add_argument("--top-k", type=int, default=20)
+    p.set_defaults(func=cmd_ask)
+
+    p = commands.add_parser("crawl", help="Re-crawl a list of URLs, re-embedding only changed chunks")
+    p.add_argument("urls_file", help="File with one URL per line")
+    p.add_argument("--interval", type=int, default=3600, help="Seconds between runs")
+    p.add_argument("--once", action="store_true", help="Run a single crawl and exit")
+    p.set_defaults(func=cmd_crawl)
+
+    p = commands.add_parser("export", help="Snapshot chunks and embeddings to .parquet or .arrow")
+    p.add_argument("path")
+    p.add_argument("--doc-id", help="Export a single document")
+    p.set_defaults(func=cmd_export)
+
+    p = commands.add_parser("import", help="Bulk-load a snapshot without re-embedding")
+    p.add_argument("path")
+    p.add_argument("--database-url", help="Postgres URL for COPY (defaults to $DATABASE_URL, else REST inserts)")
+    p.add_argument("--local", action="store_true", help="Only build a local index from the snapshot")
+    p.set_defaults(func=cmd_import)
+
+    p = commands.add_parser("serve", help="Run the HTTP API")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8000)
+    p.add_argument("--workers", type=int, default=1, help="Worker processes, each with its own warm model")
+    p.set_defaults(func=cmd_serve)
+
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    args.func(args)
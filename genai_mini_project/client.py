@@ -0,0 +1,40 @@
+"""Thin client used by the Streamlit apps.
+
+When JSCRAP_API_URL is set, calls go to the HTTP API (see api.py) so the
+UI holds no models; otherwise the service layer is used in-process.
+"""
+
+import os
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+API_URL = os.getenv("JSCRAP_API_URL")
+
+http = httpx.Client(base_url=API_URL, timeout=httpx.Timeout(120.0, read=None)) if API_URL else None
+
+def post(path, **kwargs):
+    response = http.post(path, **kwargs)
+    response.raise_for_status()
+    return response.json()
+
+def ingest_url(url):
+    """Scrapes and stores a website."""
+    if http:
+        return post("/ingest/url", json={"url": url})
+    import service
+    return service.ingest_url(url)
+
+def ingest_pdf(data, filename):
+    """Extracts and stores a PDF given its raw bytes."""
+    if http:
+        return post("/ingest/pdf", files={"file": (filename, data, "application/pdf")})
+    import service
+    return service.ingest_pdf(data, filename)
+
+def ask(question, top_k=20, session_id=None):
+    """Returns {"question", "answer"} for a question, optionally within a conversation."""
+    if http:
+        return post("/ask", json={"question": question, "top_k": top_k, "session_id": session_id})
+    import service
+    return service.ask(question, top_k, session_id)
@@ -0,0 +1,174 @@
+"""Session-level retrieval cache so follow-up questions reuse earlier turns' chunks."""
+
+import hashlib
+import json
+import re
+from collections import OrderedDict
+import numpy as np
+from pdf import corpus_generation, embed_model, fetch_embeddings, match_documents
+
+# Words that usually mean a question only makes sense together with the previous turn
+FOLLOW_UP_WORDS = {
+    "it", "its", "they", "them", "their", "this", "that", "these", "those",
+    "he", "she", "his", "her", "there", "also", "more", "else", "same",
+}
+FOLLOW_UP_PREFIXES = ("and ", "what about", "how about", "and?", "what else", "tell me more")
+FOLLOW_UP_QUESTIONS = {"why", "why not", "how", "how so", "really", "and"}
+
+class ContextCache:
+    """Keeps chunks retrieved in recent turns and answers follow-ups from them when possible.
+
+    Every question is first rewritten into a standalone query. For follow-ups, cached
+    chunks are scored against that query and merged with a fresh top_k search; the
+    search is only skipped when top_k cached chunks reach reuse_similarity and beat
+    the weakest row of the last search. Only chunks above min_similarity are sent
+    to the LLM, capped at max_context_chars.
+    """
+
+    def __init__(self, max_chunks=200, min_similarity=0.35, max_context_chars=12000, reuse_similarity=0.6):
+        self.chunks = OrderedDict()  # chunk_id -> (text, normalized embedding or None), most recent last
+        self.max_chunks = max_chunks
+        self.topic = None  # last question that stood on its own
+        self.min_similarity = min_similarity
+        self.max_context_chars = max_context_chars
+        self.reuse_similarity = reuse_similarity
+        self.floor = 1.0  # similarity of the weakest row returned by the last search
+        self.generation = corpus_generation()  # cached chunks belong to this corpus
+        self.stats = {
+            "turns": 0, "follow_ups": 0, "rpcs": 0, "rpcs_saved": 0, "supabase_calls": 0,
+            "chunks_fetched": 0, "chunks_reused": 0, "prompt_chars": 0,
+        }
+
+    def is_follow_up(self, question):
+        if self.topic is None:
+            return False
+        lowered = question.lower().strip()
+        words = set(re.findall(r"[a-z']+", lowered))
+        if lowered.rstrip("?!. ") in FOLLOW_UP_QUESTIONS:
+            return True
+        return lowered.startswith(FOLLOW_UP_PREFIXES) or bool(words & FOLLOW_UP_WORDS)
+
+    def standalone_question(self, question):
+        """Rewrites a follow-up into a self-contained query by carrying the previous turn's topic."""
+        if not self.is_follow_up(question):
+            return question
+        return f"{self.topic} {question}"
+
+    def remember(self, rows, query_embedding):
+        """Adds newly fetched rows to the cache and returns (chunk_id, similarity) in rank order.
+
+        Embeddings are kept when the search returns them and otherwise loaded lazily by
+        ensure_embeddings, the first time a follow-up has to score cached chunks.
+        """
+        ranked = []
+        new_rows = 0
+        for row in rows:
+            chunk_id = row_id(row)
+            if chunk_id in self.chunks:
+                self.chunks.move_to_end(chunk_id)
+            else:
+                embedding = row.get("embedding")
+                self.chunks[chunk_id] = (row["text"], None if embedding is None else to_vector(embedding))
+                new_rows += 1
+            similarity = row.get("similarity")
+            if similarity is None:
+                self.ensure_embeddings([chunk_id])
+                similarity = self.chunks[chunk_id][1] @ query_embedding
+            ranked.append((chunk_id, float(similarity)))
+        self.stats["chunks_fetched"] += new_rows
+        while len(self.chunks) > self.max_chunks:
+            self.chunks.popitem(last=False)
+        return ranked
+
+    def ensure_embeddings(self, ids):
+        """Fills in missing embeddings, from the table by id and by encoding only as a last resort."""
+        missing = [i for i in ids if self.chunks[i][1] is None]
+        if not missing:
+            return
+        table_ids = [i for i in missing if i.isdigit()]
+        stored = {}
+        if table_ids:
+            stored = fetch_embeddings(table_ids)
+            self.stats["supabase_calls"] += 1
+        unstored = [i for i in missing if i not in stored]
+        encoded = dict(zip(unstored, embed_model.encode([self.chunks[i][0] for i in unstored]))) if unstored else {}
+        for i in missing:
+            self.chunks[i] = (self.chunks[i][0], to_vector(stored[i] if i in stored else encoded[i]))
+
+    def cached_matches(self, query_embedding, top_k):
+        """Returns (chunk_id, similarity) for cached chunks above the similarity threshold."""
+        if not self.chunks:
+            return []
+        ids = list(self.chunks)
+        self.ensure_embeddings(ids)
+        matrix = np.stack([self.chunks[i][1] for i in ids])
+        scores = matrix @ query_embedding
+        order = np.argsort(-scores)[:top_k]
+        return [(ids[i], float(scores[i])) for i in order if scores[i] >= self.min_similarity]
+
+    def retrieve(self, question, top_k=20):
+        """Returns {"question", "standalone", "contexts"} for a question in this conversation."""
+        standalone = self.standalone_question(question)
+        follow_up = standalone != question
+        query_embedding = normalize(embed_model.encode([standalone])[0])
+        self.stats["turns"] += 1
+        generation = corpus_generation()
+        if generation != self.generation:  # The corpus changed, possibly in another process
+            self.chunks.clear()
+            self.floor = 1.0
+            self.generation = generation
+
+        cached = []
+        if follow_up:
+            self.stats["follow_ups"] += 1
+            cached = self.cached_matches(query_embedding, top_k)
+            for chunk_id, _ in cached:
+                self.chunks.move_to_end(chunk_id)  # keep them through remember's eviction
+
+        if len(cached) == top_k and cached[-1][1] >= max(self.reuse_similarity, self.floor):
+            ranked = cached
+            self.stats["rpcs_saved"] += 1
+        else:
+            rows = match_documents(query_embedding.tolist(), top_k)
+            self.stats["rpcs"] += 1
+            self.stats["supabase_calls"] += 1
+            fresh = self.remember(rows or [], query_embedding)
+            self.floor = min((similarity for _, similarity in fresh), default=1.0)
+            scores = dict(cached)
+            for chunk_id, similarity in fresh:
+                scores[chunk_id] = similarity
+            ranked = sorted(scores.items(), key=lambda item: -item[1])[:top_k]
+        cached_ids = {chunk_id for chunk_id, _ in cached}
+        for chunk_id, _ in ranked:
+            self.chunks.move_to_end(chunk_id)
+        self.stats["chunks_reused"] += sum(chunk_id in cached_ids for chunk_id, _ in ranked)
+
+        contexts = []
+        size = 0
+        for chunk_id, score in ranked:
+            text = self.chunks[chunk_id][0]
+            if contexts and (score < self.min_similarity or size + len(text) > self.max_context_chars):
+                break
+            contexts.append(text)
+            size += len(text)
+        self.stats["prompt_chars"] += size
+        if not follow_up:
+            self.topic = question
+        return {"question": question, "standalone": standalone, "contexts": contexts}
+
+def row_id(row):
+    """Uses the table id when the RPC returns one, otherwise a hash of the chunk text."""
+    if row.get("id") is not None:
+        return str(row["id"])
+    return hashlib.md5(row["text"].encode()).hexdigest()
+
+def to_vector(embedding):
+    """Normalized float32 vector from a stored embedding (JSON text, list or array)."""
+    if isinstance(embedding, str):
+        embedding = json.loads(embedding)
+    return normalize(np.asarray(embedding, dtype=np.float32))
+
+def normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
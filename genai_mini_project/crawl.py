@@ -0,0 +1,267 @@
+"""Incremental re-crawl: conditional GETs and per-chunk change detection for scraped URLs.
+
+Rows written here carry a `chunk_id` (hash of the chunk text) so changed pages can
+replace only their stale chunks; the documents table needs the `chunk_id text` and
+`simhash text` columns added by migrations/001_chunk_id_simhash.sql.
+Ingests through pdf.store_in_supabase leave rows with a chunk_id in place, and each
+run checks that the chunks recorded as stored still exist.
+
+Chunks dropped as near-duplicates of another crawled chunk are recorded with the
+simhash of that chunk (`dup_of`). When it is deleted, those records are forgotten and
+their pages crawled again, so the dropped chunks get stored in its place.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import deque
+import requests
+from bs4 import BeautifulSoup
+from scrap import clean_data, scrape_website
+from pdf import bump_corpus_generation, check_schema, embed_model, supabase, sync_corpus_index
+from dedup import DedupIndex, corpus_index, simhash
+from resilience import Deadline, call_with_retries
+
+CRAWL_DB = os.getenv("JSCRAP_CRAWL_DB", "crawl_state.sqlite")
+# Pages whose static HTML yields less text than this are assumed to need JavaScript rendering
+MIN_STATIC_CHARS = 200
+
+def connect_state():
+    conn = sqlite3.connect(CRAWL_DB, timeout=10)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS pages ("
+        "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT, crawled_at REAL)"
+    )
+    # simhash is set for chunks that were stored, dup_of for those dropped as near-duplicates
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS chunks ("
+        "url TEXT, chunk_hash TEXT, simhash TEXT, dup_of TEXT, PRIMARY KEY (url, chunk_hash))"
+    )
+    if "dup_of" not in {column[1] for column in conn.execute("PRAGMA table_info(chunks)")}:
+        conn.execute("ALTER TABLE chunks ADD COLUMN dup_of TEXT")  # State files from before dup_of
+    conn.execute("CREATE INDEX IF NOT EXISTS chunks_dup_of ON chunks (dup_of)")
+    return conn
+
+def text_hash(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def stable_chunks(text, max_chars=1000):
+    """Splits text into chunks of at most max_chars on content-defined sentence boundaries.
+
+    A chunk also ends after any sentence whose hash is divisible by 4, so an edit
+    only changes the chunks around it instead of shifting every later chunk.
+    """
+    chunks, current = [], ""
+    for sentence in re.split(r"(?<=[.!?])\s+", text):
+        while len(sentence) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+        if int(text_hash(sentence)[:8], 16) % 4 == 0:
+            chunks.append(current)
+            current = ""
+    if current:
+        chunks.append(current)
+    return [chunk for chunk in chunks if chunk.strip()]
+
+def fetch_if_changed(url, etag=None, last_modified=None):
+    """Conditional GET; returns (response, text) or (response, None) when the server says 304."""
+    headers = {"User-Agent": "Mozilla/5.0 (J-Scrap crawler)"}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    response = requests.get(url, headers=headers, timeout=30)
+    if response.status_code == 304:
+        return response, None
+    response.raise_for_status()
+    text = clean_data(BeautifulSoup(response.text, "html.parser"))
+    if len(text) < MIN_STATIC_CHARS:
+        text = scrape_website(url)  # JavaScript-rendered page, fall back to Selenium
+    return response, text
+
+def delete_chunks(doc_id, chunk_ids):
+    """Deletes the given chunks of a document from Supabase."""
+    for start in range(0, len(chunk_ids), 100):
+        batch = chunk_ids[start:start + 100]
+        call_with_retries(
+            lambda: supabase.table("documents").delete().eq("doc_id", doc_id).in_("chunk_id", batch).execute(),
+            deadline=Deadline(60),
+        )
+
+def stored_rows(doc_id):
+    """Returns the chunk_id and simhash of every row Supabase actually holds for a document."""
+    response = call_with_retries(
+        lambda: supabase.table("documents").select("chunk_id,simhash").eq("doc_id", doc_id).execute(),
+        deadline=Deadline(60),
+    )
+    return response.data
+
+def release(signatures, conn):
+    """Forgets deleted chunks, and the chunks dropped as their near-duplicates.
+
+    Pages holding such dropped chunks lose their validators, so the next refresh
+    fetches them and stores those chunks as added. Returns the URLs of those pages.
+    """
+    urls = set()
+    for signature in signatures:
+        corpus_index.discard(int(signature, 16))
+        urls.update(row[0] for row in conn.execute("SELECT url FROM chunks WHERE dup_of = ?", (signature,)))
+        conn.execute("DELETE FROM chunks WHERE dup_of = ?", (signature,))
+    conn.executemany(
+        "UPDATE pages SET etag = NULL, last_modified = NULL, content_hash = NULL WHERE url = ?", [(url,) for url in urls]
+    )
+    return urls
+
+def reconcile(url, stored, conn):
+    """Forgets a URL's crawl state when chunks it recorded as stored are missing from the table.
+
+    Rows can disappear behind the crawler's back (a manual cleanup, a restored snapshot);
+    without this the next run would see 304 or "unchanged" and never put them back.
+    Returns the URLs of other pages to refresh, see release().
+    """
+    recorded = dict(row for row in conn.execute("SELECT chunk_hash, simhash FROM chunks WHERE url = ?", (url,)) if row[1])
+    if not set(recorded) - {item["chunk_id"] for item in stored}:
+        return set()
+    print(f"♻️ Stored chunks missing for {url}, re-crawling from scratch")
+    urls = release(recorded.values(), conn)
+    conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+    conn.execute("DELETE FROM chunks WHERE url = ?", (url,))
+    return urls
+
+def refresh_url(url, conn, stats):
+    """Re-crawls one URL and re-embeds only the chunks that changed.
+
+    Returns the URLs of other pages whose dropped chunks lost their stored duplicate.
+    """
+    doc_id = hashlib.md5(url.encode()).hexdigest()
+    stored = stored_rows(doc_id)
+    orphaned = reconcile(url, stored, conn)
+    row = conn.execute("SELECT etag, last_modified, content_hash FROM pages WHERE url = ?", (url,)).fetchone()
+    etag, last_modified, content_hash = row or (None, None, None)
+
+    response, text = fetch_if_changed(url, etag, last_modified)
+    if text is None:
+        stats["not_modified"] += 1
+        return orphaned - {url}
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    new_hash = text_hash(text)
+    if new_hash == content_hash:
+        stats["unchanged"] += 1
+        conn.execute(
+            "UPDATE pages SET etag = ?, last_modified = ?, crawled_at = ? WHERE url = ?",
+            (etag, last_modified, time.time(), url),
+        )
+        return orphaned - {url}
+
+    if row is None:
+        # First crawl: drop rows from earlier ingests of this URL, which have no chunk_id to match on
+        orphaned |= release([item["simhash"] for item in stored if item.get("simhash")], conn)
+        call_with_retries(
+            lambda: supabase.table("documents").delete().eq("doc_id", doc_id).execute(), deadline=Deadline(60)
+        )
+    chunks = {text_hash(chunk): chunk for chunk in stable_chunks(text)}
+    old_hashes = dict(conn.execute("SELECT chunk_hash, simhash FROM chunks WHERE url = ?", (url,)))
+    removed = [h for h in old_hashes if h not in chunks]
+
+    # Forget removed chunks first so their edited versions are not dropped as near-duplicates.
+    # Chunks of this page that duplicated them lose their record too and count as added.
+    orphaned |= release([old_hashes[h] for h in removed if old_hashes[h]], conn)
+    old_hashes = dict(conn.execute("SELECT chunk_hash, simhash FROM chunks WHERE url = ?", (url,)))
+    added = [h for h in chunks if h not in old_hashes]
+
+    pending = DedupIndex()  # Kept chunks of this page
+    kept, signatures, duplicates = [], [], {}
+    for h in added:
+        signature = simhash(chunks[h])
+        match = corpus_index.find(signature)
+        if match is None:
+            match = pending.find(signature)
+        if match is None:
+            pending.add(signature)
+            kept.append(chunks[h])
+            signatures.append(signature)
+        else:
+            duplicates[h] = format(match, "x")
+    embeddings = embed_model.encode(kept) if kept else []
+    rows = [
+        {"doc_id": doc_id, "chunk_id": text_hash(chunk), "text": chunk, "embedding": json.dumps(embedding.tolist()),
+         "simhash": format(h, "x")}
+        for chunk, embedding, h in zip(kept, embeddings, signatures)
+    ]
+    # Rows of a previously failed run may already exist, so added chunks are deleted before inserting
+    delete_chunks(doc_id, removed + [row["chunk_id"] for row in rows])
+    for start in range(0, len(rows), 10):
+        batch = rows[start:start + 10]
+        call_with_retries(
+            lambda: supabase.table("documents").insert(batch).execute(), deadline=Deadline(60), idempotent=False
+        )
+    for h in signatures:  # Only now, so a failed run leaves nothing behind that blocks a retry
+        corpus_index.add(h)
+
+    conn.execute(
+        "INSERT OR REPLACE INTO pages (url, etag, last_modified, content_hash, crawled_at) VALUES (?, ?, ?, ?, ?)",
+        (url, etag, last_modified, new_hash, time.time()),
+    )
+    conn.executemany("DELETE FROM chunks WHERE url = ? AND chunk_hash = ?", [(url, h) for h in removed])
+    kept_signatures = {text_hash(chunk): format(h, "x") for chunk, h in zip(kept, signatures)}
+    conn.executemany(
+        "INSERT OR REPLACE INTO chunks (url, chunk_hash, simhash, dup_of) VALUES (?, ?, ?, ?)",
+        [(url, h, kept_signatures.get(h), duplicates.get(h)) for h in added],
+    )
+    stats["new" if row is None else "changed"] += 1
+    stats["chunks_embedded"] += len(kept)
+    stats["chunks_unchanged"] += len(chunks) - len(added)
+    stats["chunks_deleted"] += len(removed)
+    return orphaned - {url}
+
+def crawl(urls):
+    """Refreshes every URL once and returns per-run stats."""
+    stats = dict.fromkeys(
+        ["pages", "not_modified", "unchanged", "changed", "new", "failed",
+         "chunks_embedded", "chunks_unchanged", "chunks_deleted"], 0
+    )
+    start = time.perf_counter()
+    check_schema()
+    sync_corpus_index()
+    queue = deque(urls)
+    with connect_state() as conn:
+        while queue:
+            url = queue.popleft()
+            stats["pages"] += 1
+            try:
+                orphaned = refresh_url(url, conn, stats)
+                conn.commit()
+                queue.extend(sorted(orphaned - set(queue)))  # Store their dropped chunks in this run
+            except Exception as e:
+                conn.rollback()
+                print(f"❌ Error crawling {url}: {e}")
+                stats["failed"] += 1
+    if stats["new"] or stats["changed"] or stats["failed"]:
+        bump_corpus_generation()
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    return stats
+
+def read_urls(path):
+    """Reads http(s) URLs from a file, one per line, ignoring anything else."""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip().startswith(("http://", "https://"))]
+
+def run_scheduler(path, interval=3600, once=False):
+    """Re-crawls the URLs listed in a file every interval seconds."""
+    while True:
+        stats = crawl(read_urls(path))
+        print(f"🕸️ Crawl finished: {json.dumps(stats)}")
+        if once:
+            return stats
+        time.sleep(interval)
@@ -0,0 +1,162 @@
+"""Near-duplicate chunk detection with SimHash, run before chunks are embedded.
+
+Chunks are only dropped as duplicates of chunks that live as long as they do: an
+ad-hoc ingest dedups within its own document, the crawler across crawled pages and
+records which stored chunk each dropped one duplicates, so it can store the chunk
+again once that copy is deleted (see crawl.py).
+
+Stored rows keep their SimHash in the documents table (a `simhash text` column, see
+migrations/001_chunk_id_simhash.sql), so
+each process rebuilds corpus_index from the table (pdf.sync_corpus_index) instead of
+trusting memory that other API workers, the crawler or a restart never saw.
+"""
+
+import hashlib
+import re
+import threading
+import numpy as np
+
+BANDS = 4  # 64-bit hashes split into 4 x 16-bit bands
+BAND_BITS = 64 // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+MIN_TAIL = 1024  # Hashes added since the last merge that are scanned without the band arrays
+
+def simhash(text, shingle_size=3):
+    """Returns a 64-bit SimHash of the text's word shingles."""
+    words = re.findall(r"\w+", text.lower())
+    shingles = [" ".join(words[i:i + shingle_size]) for i in range(max(1, len(words) - shingle_size + 1))]
+    weights = [0] * 64
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+class DedupIndex:
+    """SimHash index where hashes within max_distance bits count as duplicates.
+
+    Any two hashes differing in at most 3 bits share one of the 16-bit bands. The
+    hashes are kept in a uint64 array and, per band, in a sorted array of band keys
+    with the positions they came from, so only hashes sharing a band are compared.
+    Recently added hashes form an unsorted tail that is scanned directly and merged
+    into the band arrays once it grows; the index costs ~33 bytes per hash.
+    """
+
+    def __init__(self, max_distance=3):
+        self.max_distance = max_distance
+        self.lock = threading.Lock()
+        self.load(np.zeros(0, dtype=np.uint64))
+
+    def load(self, hashes):
+        """Replaces the contents with a uint64 array of hashes and indexes all of them."""
+        self.hashes = np.zeros(max(MIN_TAIL, 2 * len(hashes)), dtype=np.uint64)
+        self.hashes[:len(hashes)] = hashes
+        self.alive = np.zeros(len(self.hashes), dtype=bool)
+        self.alive[:len(hashes)] = True
+        self.size = len(hashes)
+        self.merge()
+
+    def merge(self):
+        """Sorts every stored hash into the band arrays, emptying the tail."""
+        hashes = self.hashes[:self.size]
+        self.band_keys, self.band_rows = [], []
+        for band in range(BANDS):
+            keys = ((hashes >> np.uint64(band * BAND_BITS)) & np.uint64(BAND_MASK)).astype(np.uint16)
+            rows = np.argsort(keys, kind="stable").astype(np.uint32)
+            self.band_keys.append(keys[rows])
+            self.band_rows.append(rows)
+        self.sorted_size = self.size
+
+    def closest(self, h, rows):
+        """Returns the first live hash at the given positions within max_distance of h, or None."""
+        candidates = self.hashes[rows]
+        close = np.flatnonzero((np.bitwise_count(candidates ^ h) <= self.max_distance) & self.alive[rows])
+        return int(candidates[close[0]]) if len(close) else None
+
+    def find(self, h):
+        """Returns a stored hash close to h, or None."""
+        match = self.closest(np.uint64(h), np.arange(self.sorted_size, self.size))
+        for band in range(BANDS):
+            if match is not None:
+                break
+            key = (h >> (band * BAND_BITS)) & BAND_MASK
+            keys = self.band_keys[band]
+            start, end = np.searchsorted(keys, key, "left"), np.searchsorted(keys, key, "right")
+            if start < end:
+                match = self.closest(np.uint64(h), self.band_rows[band][start:end])
+        return match
+
+    def insert(self, h):
+        if self.size == len(self.hashes):
+            live = self.hashes[:self.size][self.alive[:self.size]]  # Discarded hashes are dropped here
+            self.load(live)
+        self.hashes[self.size] = h
+        self.alive[self.size] = True
+        self.size += 1
+        if self.size - self.sorted_size > max(MIN_TAIL, self.sorted_size // 8):
+            self.merge()
+
+    def add(self, h):
+        """Indexes h, e.g. once its chunk has been written."""
+        with self.lock:
+            self.insert(h)
+
+    def check_and_add(self, h):
+        """Adds h unless a near-duplicate is already indexed; returns True when h was new."""
+        with self.lock:
+            if self.find(h) is not None:
+                return False
+            self.insert(h)
+            return True
+
+    def discard(self, h):
+        """Forgets a hash whose chunk was deleted from the corpus."""
+        with self.lock:
+            rows = np.flatnonzero((self.hashes[:self.size] == np.uint64(h)) & self.alive[:self.size])
+            if len(rows):
+                self.alive[rows[0]] = False
+
+    def reset(self):
+        self.rebuild([])
+
+    def rebuild(self, hashes):
+        """Replaces the contents with the given hashes."""
+        hashes = np.fromiter(hashes, dtype=np.uint64)
+        with self.lock:
+            self.load(hashes)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.alive[:self.size]))
+
+    def nbytes(self):
+        arrays = [self.hashes, self.alive] + self.band_keys + self.band_rows
+        return sum(array.nbytes for array in arrays)
+
+# Crawled chunks stored in the documents table, as far as this process has seen
+corpus_index = DedupIndex()
+
+def dedup_chunks(chunks, index=corpus_index, pending=None):
+    """Drops chunks that near-duplicate the corpus or earlier chunks of the same ingest.
+
+    Kept chunks go into `pending` when one is given, so the caller can move them to
+    `index` only after they are written and a failed write blocks nothing; without
+    it they are added to `index` directly.
+    Returns (kept_chunks, their simhashes, stats) where stats counts the dropped chunks and bytes.
+    """
+    target = index if pending is None else pending
+    kept = []
+    signatures = []
+    dropped_bytes = 0
+    for chunk in chunks:
+        h = simhash(chunk)
+        if (pending is None or index.find(h) is None) and target.check_and_add(h):
+            kept.append(chunk)
+            signatures.append(h)
+        else:
+            dropped_bytes += len(chunk.encode())
+    stats = {
+        "chunks": len(chunks),
+        "chunks_dropped": len(chunks) - len(kept),
+        "bytes_saved": dropped_bytes,
+    }
+    return kept, signatures, stats
@@ -0,0 +1,130 @@
+"""Bounded question/answer history for the Streamlit apps."""
+
+import os
+import sqlite3
+import time
+import uuid
+from collections import deque
+from contextlib import closing
+from itertools import islice
+
+# Optional SQLite file holding every session's history; history stays in memory only when unset
+HISTORY_DB = os.getenv("JSCRAP_HISTORY_DB")
+MAX_ENTRIES = int(os.getenv("JSCRAP_HISTORY_MAX_ENTRIES", "200"))
+MAX_BYTES = int(os.getenv("JSCRAP_HISTORY_MAX_BYTES", str(512 * 1024)))
+# Stored history of a key nobody used for this long is deleted
+TTL_DAYS = float(os.getenv("JSCRAP_HISTORY_TTL_DAYS", "30"))
+
+class HistoryStore:
+    """Newest-first Q&A history kept in a ring buffer capped by entries and bytes.
+
+    With a db_path, entries are written to SQLite instead and every read goes there,
+    so memory stays flat and pages never mix two sources; each insert prunes that
+    key to the same caps, and keys idle for ttl_days are deleted. The key must
+    identify one user (e.g. f"web:{user_key(st.query_params)}"); clear() deletes
+    only that key.
+    """
+
+    def __init__(self, key, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, db_path=HISTORY_DB, ttl_days=TTL_DAYS):
+        self.key = key
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self.entries = deque(maxlen=max_entries)  # oldest on the left
+        self.size = 0
+        if db_path:
+            with self.connect() as conn, conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS history ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT, question TEXT, answer TEXT, created REAL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS history_key ON history (key, id)")
+                conn.execute(
+                    "DELETE FROM history WHERE key IN (SELECT key FROM history GROUP BY key HAVING MAX(created) < ?)",
+                    (time.time() - ttl_days * 86400,),
+                )
+
+    def connect(self):
+        """Opens a connection that is closed, not just committed, when the with-block exits."""
+        return closing(sqlite3.connect(self.db_path, timeout=10))
+
+    def remember(self, question, answer):
+        """Adds an entry to the in-memory buffer, evicting the oldest ones past the caps."""
+        if len(self.entries) == self.entries.maxlen:
+            self.size -= entry_size(self.entries[0])
+        self.entries.append((question, answer))
+        self.size += entry_size((question, answer))
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            self.size -= entry_size(self.entries.popleft())
+
+    def add(self, question, answer):
+        """Records a new question and answer."""
+        if not self.db_path:
+            return self.remember(question, answer)
+        with self.connect() as conn, conn:
+            conn.execute(
+                "INSERT INTO history (key, question, answer, created) VALUES (?, ?, ?, ?)",
+                (self.key, question, answer, time.time()),
+            )
+            self.prune(conn)
+
+    def prune(self, conn):
+        """Deletes this key's oldest rows past max_entries and max_bytes, keeping the newest."""
+        conn.execute(
+            "DELETE FROM history WHERE key = ? AND id < ("
+            "SELECT MIN(id) FROM (SELECT id FROM history WHERE key = ? ORDER BY id DESC LIMIT ?))",
+            (self.key, self.key, self.max_entries),
+        )
+        conn.execute(
+            "DELETE FROM history WHERE id IN (SELECT id FROM ("
+            "SELECT id, ROW_NUMBER() OVER newest AS n,"
+            " SUM(length(CAST(question AS BLOB)) + length(CAST(answer AS BLOB))) OVER newest AS total"
+            " FROM history WHERE key = ? WINDOW newest AS (ORDER BY id DESC)"
+            ") WHERE n > 1 AND total > ?)",
+            (self.key, self.max_bytes),
+        )
+
+    def clear(self):
+        """Removes all entries for this key."""
+        self.entries.clear()
+        self.size = 0
+        if self.db_path:
+            with self.connect() as conn, conn:
+                conn.execute("DELETE FROM history WHERE key = ?", (self.key,))
+
+    def __len__(self):
+        if self.db_path:
+            with self.connect() as conn:
+                return conn.execute("SELECT COUNT(*) FROM history WHERE key = ?", (self.key,)).fetchone()[0]
+        return len(self.entries)
+
+    def page_count(self, page_size=10):
+        return max(1, -(-len(self) // page_size))
+
+    def page(self, number=0, page_size=10):
+        """Returns (question, answer) pairs for a page, page 0 being the newest."""
+        start = number * page_size
+        if not self.db_path:
+            return list(islice(reversed(self.entries), start, start + page_size))
+        with self.connect() as conn:
+            return conn.execute(
+                "SELECT question, answer FROM history WHERE key = ? ORDER BY id DESC LIMIT ? OFFSET ?",
+                (self.key, page_size, start),
+            ).fetchall()
+
+def user_key(query_params):
+    """Returns the user id kept in the page URL (?user=...), adding a new one when missing.
+
+    Unlike a per-session id it survives reloads and bookmarks, so stored history stays
+    reachable. It is not a login: anyone holding the URL sees that history.
+    """
+    try:
+        return str(uuid.UUID(query_params.get("user", "")))
+    except ValueError:
+        user = str(uuid.uuid4())
+        query_params["user"] = user
+        return user
+
+def entry_size(entry):
+    question, answer = entry
+    return len(question.encode()) + len(answer.encode())
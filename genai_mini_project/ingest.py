@@ -0,0 +1,108 @@
+"""Bounded-memory ingestion pipeline: chunk -> dedup -> embed in batches -> serialize -> write.
+
+Only one embedding batch is alive at a time, embeddings stay NumPy arrays until the
+rows being written are serialized, and at most `write_batch` rows are serialized at
+once, so peak memory depends on the memory budget rather than on the input size.
+"""
+
+import json
+import os
+import time
+from dedup import DedupIndex, dedup_chunks
+
+CHUNK_SIZE = 1000  # 🔹 Chunk size: 1000 chars
+MAX_MEMORY_MB = int(os.getenv("JSCRAP_INGEST_MAX_MEMORY_MB", "64"))
+# Rough working set per chunk in flight: text, float32 vector, JSON row and encoder activations
+BYTES_PER_CHUNK = 32 * 1024
+
+def iter_chunks(source, size=CHUNK_SIZE):
+    """Yields fixed-size chunks from a string or from an iterable of text pieces (e.g. pages)."""
+    if isinstance(source, str):
+        for start in range(0, len(source), size):
+            yield source[start:start + size]
+        return
+    buffer = ""
+    for piece in source:
+        start = 0
+        if buffer:
+            start = size - len(buffer)
+            buffer += piece[:start]
+            if len(buffer) < size:
+                continue
+            yield buffer
+            buffer = ""
+        for start in range(start, len(piece), size):
+            chunk = piece[start:start + size]
+            if len(chunk) < size:
+                buffer = chunk
+            else:
+                yield chunk
+    if buffer:
+        yield buffer
+
+def chunks_per_batch(max_memory_mb=MAX_MEMORY_MB):
+    """How many chunks can be embedded at once within the memory budget."""
+    return max(1, max_memory_mb * 2**20 // BYTES_PER_CHUNK)
+
+def ingest_chunks(chunks, doc_id, encode, write, max_memory_mb=MAX_MEMORY_MB, write_batch=10, dedup=True):
+    """Embeds and writes chunks in bounded batches; returns counts and timings.
+
+    encode(list_of_text) must return a 2-D NumPy array; write(rows) stores a list of rows
+    and returns False (or raises) when it could not. Chunks are only deduplicated
+    against earlier chunks of the same document, which is deleted as a whole, and
+    count only once their write succeeded.
+    """
+    stats = {
+        "chunks": 0, "chunks_dropped": 0, "bytes_saved": 0, "chunks_stored": 0, "chunks_failed": 0,
+        "embed_seconds": 0.0,
+    }
+    batch_limit = chunks_per_batch(max_memory_mb)
+    batch = []
+    stored = DedupIndex()  # Written chunks of this ingest
+    pending = DedupIndex()  # Kept chunks of this ingest that are not written yet
+
+    def flush(batch):
+        kept = batch
+        signatures = [None] * len(batch)
+        stats["chunks"] += len(batch)
+        if dedup:
+            kept, signatures, dedup_stats = dedup_chunks(batch, stored, pending)  # 🔹 Skip near-duplicate boilerplate
+            stats["chunks_dropped"] += dedup_stats["chunks_dropped"]
+            stats["bytes_saved"] += dedup_stats["bytes_saved"]
+        if not kept:
+            return
+        start = time.perf_counter()
+        embeddings = encode(kept)
+        stats["embed_seconds"] += time.perf_counter() - start
+        for offset in range(0, len(kept), write_batch):
+            rows = [
+                {"doc_id": doc_id, "text": chunk, "embedding": json.dumps(embedding.tolist()),
+                 "simhash": None if h is None else format(h, "x")}
+                for chunk, embedding, h in zip(
+                    kept[offset:offset + write_batch], embeddings[offset:offset + write_batch],
+                    signatures[offset:offset + write_batch],
+                )
+            ]
+            try:
+                written = write(rows) is not False
+            except Exception as e:
+                print(f"❌ Error writing chunks: {e}")
+                written = False
+            for h in signatures[offset:offset + write_batch]:
+                if h is not None:
+                    pending.discard(h)
+                    if written:
+                        stored.add(h)
+            stats["chunks_stored" if written else "chunks_failed"] += len(rows)
+
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= batch_limit:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    per_chunk = stats["embed_seconds"] / stats["chunks_stored"] if stats["chunks_stored"] else 0.0
+    stats["embed_seconds_saved"] = per_chunk * stats["chunks_dropped"]
+    return stats
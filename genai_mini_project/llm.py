@@ -9,6 +9,9 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 # ✅ Configure Gemini AI
 genai.configure(api_key=GEMINI_API_KEY)
 
+# ✅ Reuse one model client across requests
+model = genai.GenerativeModel("gemini-1.5-pro")
+
 def get_gemini_response(context, question):
     """Gets response from Gemini AI based strictly on retrieved context."""
     
@@ -16,8 +19,6 @@ def get_gemini_response(context, question):
     if not context.strip():
         return "No Relevant Data Found."
 
-    model = genai.GenerativeModel("gemini-1.5-pro")
-    
     prompt = f"""
     You are an AI assistant answering questions based on a document.
 
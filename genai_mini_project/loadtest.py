@@ -0,0 +1,203 @@
+"""Load-test driver simulating concurrent Streamlit sessions against the service layer.
+
+All sessions share one process, one embedding model and one Supabase client, as they
+do under Streamlit. Supabase is replaced by mock_supabase.py, running in a child
+process so its CPU use stays out of the measurements, and Gemini by a stand-in, both
+with configurable latency, so only the app's own costs and contention are real.
+
+    python loadtest.py --ramp 1 4 16 32 --duration 30 --ingest-ratio 0.05
+
+Each stage starts from a freshly seeded corpus and reports throughput, latency
+percentiles per operation, asks that found no context, scheduler lag (how late a
+5 ms sleeper thread wakes up, a proxy for GIL contention), the share of wall time
+ops spent on CPU, and RSS growth.
+
+Ingests replace the corpus as they do in the app (asks that find no context while
+that happens show up in the empty-context count), and the pause
+pdf.py takes after each write batch to respect Supabase rate limits is set by
+--write-pause (0 by default, since the mock has no rate limit).
+"""
+
+import argparse
+import os
+import random
+import resource
+import threading
+import time
+import uuid
+import numpy as np
+from mock_supabase import start_mock_process
+
+QUESTIONS = [
+    "What products does the company sell?",
+    "Who founded the company and when?",
+    "What are the pricing plans?",
+    "Where are the offices located?",
+    "What does the privacy policy say about cookies?",
+]
+FOLLOW_UPS = ["And how much does it cost?", "Tell me more about that.", "What about their support?"]
+WORDS = "widget gadget pricing support office founder cookie plan enterprise customer product team".split()
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+
+class FakeGeminiModel:
+    """Stand-in for genai.GenerativeModel that sleeps instead of calling the API."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, prompt):
+        time.sleep(random.expovariate(1 / self.latency) if self.latency else 0)
+        return type("Response", (), {"text": f"Answer based on {len(prompt)} prompt characters."})()
+
+class Recorder:
+    """Thread-safe latency, CPU and error counters per operation."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.cpu = {}
+        self.errors = {}
+        self.empty = 0  # Searches that returned no rows
+
+    def record_search(self, rows):
+        if not rows:
+            with self.lock:
+                self.empty += 1
+
+    def record(self, op, seconds, cpu_seconds, error=None):
+        with self.lock:
+            self.latencies.setdefault(op, []).append(seconds)
+            self.cpu[op] = self.cpu.get(op, 0.0) + cpu_seconds
+            if error is not None:
+                self.errors[op] = self.errors.get(op, 0) + 1
+
+def lag_probe(stop, lags, interval=0.005):
+    """Measures how late a thread wakes from a short sleep while the workload runs."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        time.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+def memory_probe(stop, samples):
+    while not stop.is_set():
+        samples.append(rss_mb())
+        stop.wait(0.5)
+
+def session(service, recorder, stop, ingest_ratio, think_time, doc_chars, seed):
+    """One simulated user: mostly questions with follow-ups, sometimes an ingest."""
+    rng = random.Random(seed)
+    session_id = str(uuid.uuid4())
+    while not stop.is_set():
+        if rng.random() < ingest_ratio:
+            op = "ingest"
+            text = " ".join(rng.choice(WORDS) for _ in range(doc_chars // 8))
+            call = lambda: service.ingest_text(text, f"loadtest-{session_id}")
+        else:
+            op = "ask"
+            question = rng.choice(FOLLOW_UPS if rng.random() < 0.3 else QUESTIONS)
+            call = lambda: service.ask(question, session_id=session_id)
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        error = None
+        try:
+            call()
+        except Exception as e:
+            error = e
+        recorder.record(op, time.perf_counter() - start, time.thread_time() - cpu_start, error)
+        stop.wait(rng.expovariate(1 / think_time) if think_time else 0)
+
+def seed(service, args):
+    """Replaces the corpus with a fresh seed document."""
+    rng = random.Random(0)
+    service.ingest_text(" ".join(rng.choice(WORDS) for _ in range(args.doc_chars // 8)), "loadtest-seed")
+
+def counting_search(match_documents, current):
+    """Wraps match_documents so the running stage's recorder (current[0]) sees searches that found nothing."""
+    def search(*args, **kwargs):
+        rows = match_documents(*args, **kwargs)
+        current[0].record_search(rows)
+        return rows
+    return search
+
+def run_stage(service, sessions, args, current):
+    seed(service, args)
+    recorder, stop = Recorder(), threading.Event()
+    current[0] = recorder
+    lags, memory = [], []
+    probes = [
+        threading.Thread(target=lag_probe, args=(stop, lags), daemon=True),
+        threading.Thread(target=memory_probe, args=(stop, memory), daemon=True),
+    ]
+    workers = [
+        threading.Thread(
+            target=session,
+            args=(service, recorder, stop, args.ingest_ratio, args.think_time, args.doc_chars, n),
+            daemon=True,
+        )
+        for n in range(sessions)
+    ]
+    start = time.perf_counter()
+    for thread in probes + workers:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"\n👥 {sessions} sessions, {elapsed:.1f}s")
+    total = sum(len(v) for v in recorder.latencies.values())
+    print(f"   throughput: {total / elapsed:.2f} ops/s")
+    for op, latencies in sorted(recorder.latencies.items()):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        cpu_share = recorder.cpu[op] / sum(latencies) if sum(latencies) else 0.0
+        print(f"   {op:<7} n={len(latencies):<6} p50={p50:8.1f}ms p95={p95:8.1f}ms p99={p99:8.1f}ms "
+              f"errors={recorder.errors.get(op, 0)} cpu/wall={cpu_share:.0%}")
+    asks = len(recorder.latencies.get("ask", []))
+    if asks:
+        print(f"   searches with no context: {recorder.empty} ({recorder.empty / asks:.0%} of asks)")
+    if lags:
+        lag_p50, lag_p99 = np.percentile(lags, [50, 99]) * 1000
+        print(f"   scheduler lag: p50={lag_p50:.2f}ms p99={lag_p99:.2f}ms")
+    if memory:
+        print(f"   RSS: start={memory[0]:.0f}MB peak={max(memory):.0f}MB end={memory[-1]:.0f}MB")
+    return total / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ramp", type=int, nargs="+", default=[1, 4, 16, 32], help="Concurrent sessions per stage")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per stage")
+    parser.add_argument("--ingest-ratio", type=float, default=0.05, help="Fraction of operations that ingest")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean seconds between a session's operations")
+    parser.add_argument("--doc-chars", type=int, default=20000, help="Size of ingested documents")
+    parser.add_argument("--supabase-latency", type=float, default=0.05)
+    parser.add_argument("--supabase-jitter", type=float, default=0.02)
+    parser.add_argument("--gemini-latency", type=float, default=1.0, help="Mean seconds per Gemini call")
+    parser.add_argument("--write-pause", type=float, default=0.0,
+                        help="Seconds pdf.py sleeps after each write batch (2 in production)")
+    args = parser.parse_args()
+
+    mock, port = start_mock_process(latency=args.supabase_latency, jitter=args.supabase_jitter)
+    # Must be set before pdf.py creates the shared client
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{port}"
+    os.environ["SUPABASE_KEY"] = "mock.mock.mock"
+    os.environ["SUPABASE_WRITE_PAUSE"] = str(args.write_pause)
+    import context_cache
+    import llm
+    import service
+    llm.model = FakeGeminiModel(args.gemini_latency)
+    current = [None]
+    context_cache.match_documents = counting_search(context_cache.match_documents, current)
+
+    best = (0, 0.0)
+    for sessions in args.ramp:
+        throughput = run_stage(service, sessions, args, current)
+        if throughput > best[1] * 1.1:
+            best = (sessions, throughput)
+    print(f"\n📈 Throughput stopped improving by >10% after {best[0]} sessions ({best[1]:.2f} ops/s)")
+    mock.terminate()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+-- Adds the columns written by the re-crawler (chunk_id, see crawl.py) and by
+-- near-duplicate detection (simhash, see dedup.py) to an existing documents table.
+-- Without them every insert fails, so run this before deploying code that writes them:
+--
+--     psql "$DATABASE_URL" -f migrations/001_chunk_id_simhash.sql
+--
+-- or paste it into the Supabase SQL editor. It is safe to run more than once.
+
+alter table documents add column if not exists chunk_id text;
+alter table documents add column if not exists simhash text;
+
+-- crawl.py looks rows up and deletes them by (doc_id, chunk_id)
+create index if not exists documents_doc_id_chunk_id_idx on documents (doc_id, chunk_id);
+
+-- Let PostgREST see the new columns without a restart
+notify pgrst, 'reload schema';
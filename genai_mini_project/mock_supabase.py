@@ -0,0 +1,272 @@
+"""Local stand-in for the Supabase REST API with fault injection.
+
+Serves the `documents` table and the `match_documents` RPC in memory so the
+resilience layer (resilience.py) can be exercised without a real backend:
+
+    python mock_supabase.py --port 54321 --latency 0.2 --error-rate 0.1 --disconnect-rate 0.05
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=mock.mock.mock python cli.py ask "..."
+
+Faults can be changed while running, e.g. to simulate an outage and recovery:
+
+    curl -X POST localhost:54321/__faults -d '{"outage": true}'
+
+check_resilience.py runs the retry, deadline, breaker and hedging scenarios against it.
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+class MockStore:
+    """In-memory documents table plus the fault settings applied to every request."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, disconnect_rate=0.0, outage=False,
+                 slow_every=0, slow_latency=0.0):
+        self.rows = []
+        self.next_id = 1
+        self.lock = threading.Lock()
+        self.faults = {
+            "latency": latency, "jitter": jitter, "error_rate": error_rate,
+            "disconnect_rate": disconnect_rate, "outage": outage,
+            "slow_every": slow_every, "slow_latency": slow_latency,
+        }
+        self.requests = 0
+
+def parse_filters(query):
+    """Splits PostgREST query params into (select, limit, offset, filters, order)."""
+    select, limit, offset, filters, order = None, None, 0, [], None
+    for key, value in parse_qsl(query, keep_blank_values=True):
+        if key == "select":
+            select = None if value == "*" else value.split(",")
+        elif key == "order":
+            column, _, direction = value.partition(".")
+            order = (column, direction.startswith("desc"))
+        elif key == "limit":
+            limit = int(value)
+        elif key == "offset":
+            offset = int(value)
+        else:
+            op, _, operand = value.partition(".")
+            filters.append((key, op, operand))
+    return select, limit, offset, filters, order
+
+def matches_filter(row, column, op, operand):
+    value = "" if row.get(column) is None else str(row.get(column))
+    if op == "eq":
+        return value == unquote(operand)
+    if op == "neq":
+        return value != unquote(operand)
+    if op == "gt":
+        return float(row.get(column) or 0) > float(operand)
+    if op == "is" and operand == "null":
+        return row.get(column) is None
+    if op == "in":
+        return value in [item.strip('"') for item in operand.strip("()").split(",")]
+    return True
+
+def matches(row, filters):
+    for column, op, operand in filters:
+        negate = op == "not"
+        if negate:
+            op, _, operand = operand.partition(".")
+        if matches_filter(row, column, op, operand) == negate:
+            return False
+    return True
+
+def project(row, select):
+    return dict(row) if select is None else {column: row.get(column) for column in select}
+
+def cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+def make_handler(store):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def inject_faults(self):
+            """Applies configured latency and failures; returns False if the request was failed."""
+            faults = store.faults
+            with store.lock:
+                store.requests += 1
+                number = store.requests
+            time.sleep(max(0.0, faults["latency"] + random.uniform(-faults["jitter"], faults["jitter"])))
+            if faults["slow_every"] and number % faults["slow_every"] == 1 % faults["slow_every"]:
+                time.sleep(faults["slow_latency"])  # Stall every Nth request, e.g. to exercise hedging
+            if random.random() < faults["disconnect_rate"]:
+                self.close_connection = True  # Drop the connection without a response
+                return False
+            if faults["outage"] or random.random() < faults["error_rate"]:
+                self.send_text(503, "Service Unavailable")
+                return False
+            return True
+
+        def send_text(self, status, text):
+            body = text.encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_json(self, status, data):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"null")
+
+        def route(self):
+            url = urlsplit(self.path)
+            return url.path.rstrip("/"), url.query
+
+        def do_GET(self):
+            path, query = self.route()
+            if path == "/__stats":
+                return self.send_json(200, {"rows": len(store.rows), "requests": store.requests, **store.faults})
+            if not self.inject_faults():
+                return
+            if path != "/rest/v1/documents":
+                return self.send_json(404, {"message": "Not found", "code": "PGRST000"})
+            select, limit, offset, filters, order = parse_filters(query)
+            with store.lock:
+                rows = [row for row in store.rows if matches(row, filters)]
+            if order:
+                rows.sort(key=lambda row: row.get(order[0]), reverse=order[1])
+            rows = [project(row, select) for row in rows]
+            end = None if limit is None else offset + limit
+            self.send_json(200, rows[offset:end])
+
+        def do_POST(self):
+            path, query = self.route()
+            if path == "/__faults":
+                store.faults.update(self.read_json() or {})
+                return self.send_json(200, store.faults)
+            body = self.read_json()
+            if not self.inject_faults():
+                return
+            if path == "/rest/v1/documents":
+                inserted = []
+                with store.lock:
+                    for row in body if isinstance(body, list) else [body]:
+                        row = dict(row, id=store.next_id)
+                        store.next_id += 1
+                        store.rows.append(row)
+                        inserted.append(row)
+                return self.send_json(201, inserted)
+            if path == "/rest/v1/rpc/match_documents":
+                query_embedding = body["query_embedding"]
+                with store.lock:
+                    rows = list(store.rows)
+                scored = []
+                for row in rows:
+                    embedding = row["embedding"]
+                    if isinstance(embedding, str):
+                        embedding = json.loads(embedding)
+                    scored.append((cosine(query_embedding, embedding), row))
+                scored.sort(key=lambda item: -item[0])
+                result = [
+                    {"id": row["id"], "doc_id": row["doc_id"], "text": row["text"], "similarity": score}
+                    for score, row in scored[:body.get("match_count", 20)]
+                ]
+                return self.send_json(200, result)
+            self.send_json(404, {"message": "Not found", "code": "PGRST202"})
+
+        def do_PATCH(self):
+            path, query = self.route()
+            body = self.read_json()
+            if not self.inject_faults():
+                return
+            _, _, _, filters, _ = parse_filters(query)
+            with store.lock:
+                updated = [row for row in store.rows if matches(row, filters)]
+                for row in updated:
+                    row.update(body)
+            self.send_json(200, updated)
+
+        def do_DELETE(self):
+            path, query = self.route()
+            self.read_json()  # Drain the body so the kept-alive connection stays in sync
+            if not self.inject_faults():
+                return
+            _, _, _, filters, _ = parse_filters(query)
+            with store.lock:
+                deleted = [row for row in store.rows if matches(row, filters)]
+                store.rows = [row for row in store.rows if not matches(row, filters)]
+            self.send_json(200, deleted)
+
+    return Handler
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        """Stays quiet about clients that hung up, which timed-out callers do on purpose."""
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+def start_mock_server(host="127.0.0.1", port=0, **faults):
+    """Starts the mock in a background thread; returns (server, store). Port 0 picks a free port."""
+    store = MockStore(**faults)
+    server = MockServer((host, port), make_handler(store))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, store
+
+def serve_mock(conn, host, port, faults):
+    """Child process body of start_mock_process; serves until the process is terminated."""
+    server, _ = start_mock_server(host, port, **faults)
+    conn.send(server.server_address[1])
+    threading.Event().wait()
+
+def start_mock_process(host="127.0.0.1", port=0, **faults):
+    """Starts the mock in a child process; returns (process, port).
+
+    Its JSON parsing and cosine scoring then do not compete with the caller's threads
+    for the GIL, as a real backend would not, so load measurements stay honest.
+    """
+    conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.get_context("spawn").Process(
+        target=serve_mock, args=(child_conn, host, port, faults), daemon=True
+    )
+    process.start()
+    return process, conn.recv()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fault-injecting Supabase stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random +/- seconds on top of latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="Fraction of connections dropped")
+    parser.add_argument("--outage", action="store_true", help="Answer every request with 503")
+    parser.add_argument("--slow-every", type=int, default=0, help="Stall every Nth request")
+    parser.add_argument("--slow-latency", type=float, default=0.0, help="Seconds a stalled request waits")
+    args = parser.parse_args()
+
+    server, store = start_mock_server(
+        args.host, args.port, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, disconnect_rate=args.disconnect_rate, outage=args.outage,
+        slow_every=args.slow_every, slow_latency=args.slow_latency,
+    )
+    print(f"🧪 Mock Supabase running on http://{args.host}:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
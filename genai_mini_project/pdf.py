@@ -81,15 +81,19 @@
 
 
 
-import fitz  # PyMuPDF for PDF processing
 import hashlib
-import json
+import tempfile
+import uuid
+import threading
 import os
 import time
-import httpx
 from dotenv import load_dotenv
 from sentence_transformers import SentenceTransformer
 from supabase import create_client, Client
+from dedup import corpus_index
+from ingest import MAX_MEMORY_MB, ingest_chunks, iter_chunks
+from pdf_extract import extract_pages
+from resilience import Deadline, call_with_retries, enforce_deadlines, hedged
 
 # Load environment variables
 load_dotenv()
@@ -100,88 +104,240 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
 # Create Supabase client
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+enforce_deadlines(supabase)  # HTTP timeouts follow each operation's deadline
+
+# Time budgets (seconds) for whole Supabase operations, retries included
+SEARCH_DEADLINE = float(os.getenv("SUPABASE_SEARCH_DEADLINE", "10"))
+WRITE_DEADLINE = float(os.getenv("SUPABASE_WRITE_DEADLINE", "60"))
+# Send a second search if the first has not answered by then
+SEARCH_HEDGE_AFTER = float(os.getenv("SUPABASE_SEARCH_HEDGE_AFTER", "1.0"))
+# Pause after each delete/insert batch to stay under Supabase rate limits
+WRITE_PAUSE = float(os.getenv("SUPABASE_WRITE_PAUSE", "2"))
+# Serve searches from a snapshot file (see snapshot.py) instead of Supabase
+LOCAL_INDEX = os.getenv("JSCRAP_LOCAL_INDEX")
+local_index = None
+local_index_lock = threading.Lock()  # So concurrent first searches build the index only once
+# Columns added after the documents table was first created, see migrations/
+MIGRATED_COLUMNS = ("chunk_id", "simhash")
+MIGRATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations", "001_chunk_id_simhash.sql")
+schema_checked = False
+# Stamp rewritten after every change to the documents table, so context caches in all
+# processes on this host (API workers, CLI runs, crawls) drop chunks of an older corpus
+CORPUS_GENERATION_FILE = os.getenv(
+    "JSCRAP_CORPUS_GENERATION", os.path.join(tempfile.gettempdir(), "jscrap_corpus.generation")
+)
 
 # Embedding Model
 embed_model = SentenceTransformer("all-MiniLM-L6-v2")
 
 def extract_text_from_pdf(pdf_file):
-    """Extracts text from an uploaded PDF file."""
-    doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
-    text = "\n".join([page.get_text("text") for page in doc])
+    """Extracts text from an uploaded PDF file, with OCR for scanned pages and row-wise tables."""
+    text = "\n".join(extract_pages(pdf_file.read()))
     return text
 
-def delete_old_data():
-    """Deletes old records in batches to prevent overload."""
+def delete_old_data(keep=None):
+    """Deletes old records in batches to prevent overload.
+
+    Rows with a chunk_id belong to the re-crawler (crawl.py), which tracks them in its
+    own state, so they are left alone, as are the rows of the `keep` doc_id.
+    """
+    def old_rows(query):
+        query = query.is_("chunk_id", "null")
+        return query if keep is None else query.neq("doc_id", keep)
+
     while True:
         try:
-            response = supabase.table("documents").select("doc_id").limit(100).execute()
+            deadline = Deadline(WRITE_DEADLINE)
+            response = call_with_retries(
+                lambda: old_rows(supabase.table("documents").select("doc_id")).limit(100).execute(),
+                deadline=deadline,
+            )
             if not response.data:
                 break  # Stop when no more data
             
             doc_ids = [item["doc_id"] for item in response.data]
-            supabase.table("documents").delete().in_("doc_id", doc_ids).execute()
-            time.sleep(2)  # Prevent Supabase rate limit errors
-        except httpx.RemoteProtocolError:
-            print("🔄 Server disconnected, retrying delete operation...")
-            time.sleep(5)  # Wait before retrying
+            call_with_retries(
+                lambda: old_rows(supabase.table("documents").delete().in_("doc_id", doc_ids)).execute(),
+                deadline=deadline,
+            )
+            time.sleep(WRITE_PAUSE)  # Prevent Supabase rate limit errors
         except Exception as e:
             print(f"❌ Error deleting old data: {e}")
             break
 
-def store_in_supabase(text, filename, max_retries=3):
-    """Stores new text with embeddings in Supabase after deleting old records."""
-    delete_old_data()  # ✅ Delete old records first
-
-    doc_id = hashlib.md5(filename.encode()).hexdigest()
-    chunks = [text[i:i+1000] for i in range(0, len(text), 1000)]  # 🔹 Chunk size: 1000 chars
-    embeddings = embed_model.encode(chunks).tolist()
+def check_schema():
+    """Raises when the documents table lacks columns that ingests and crawls write.
 
-    batch_size = 10  # Insert in batches to prevent API overload
-    batch_data = []
+    Without them every insert fails as a non-transient error, so this runs once per
+    process before the first write instead of letting an ingest half-happen.
+    """
+    global schema_checked
+    if schema_checked:
+        return
+    try:
+        call_with_retries(
+            lambda: supabase.table("documents").select(",".join(("id",) + MIGRATED_COLUMNS)).limit(1).execute(),
+            deadline=Deadline(WRITE_DEADLINE),
+        )
+    except Exception as e:
+        if str(getattr(e, "code", "")) in ("42703", "PGRST204"):  # undefined column
+            raise RuntimeError(
+                f"The documents table is missing the {'/'.join(MIGRATED_COLUMNS)} columns ({e}); "
+                f"apply {MIGRATION_FILE} first"
+            ) from e
+        raise
+    schema_checked = True
+
+def corpus_generation():
+    """Returns the current corpus stamp ("" until the first ingest on this host)."""
+    try:
+        with open(CORPUS_GENERATION_FILE) as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
+
+def bump_corpus_generation():
+    """Marks the documents table as changed for every process on this host."""
+    temp_path = f"{CORPUS_GENERATION_FILE}.{os.getpid()}.{threading.get_ident()}"
+    with open(temp_path, "w") as f:
+        f.write(str(time.time_ns()))
+    os.replace(temp_path, CORPUS_GENERATION_FILE)  # Atomic, so readers never see a partial stamp
+
+def sync_corpus_index():
+    """Rebuilds the dedup index from the simhash column of the crawled rows.
+
+    Called before every crawl run, so chunks written by other processes count and
+    chunks deleted since do not. Rows of ad-hoc ingests are left out: the next ingest
+    deletes them, so no crawled chunk may be dropped as their duplicate.
+    """
+    try:
+        signatures, last_id = [], 0
+        while True:
+            rows = call_with_retries(
+                lambda: supabase.table("documents").select("id,simhash").not_.is_("chunk_id", "null")
+                .gt("id", last_id).order("id").limit(1000).execute(),
+                deadline=Deadline(WRITE_DEADLINE),
+            ).data
+            if not rows:
+                break
+            signatures.extend(int(row["simhash"], 16) for row in rows if row.get("simhash"))
+            last_id = rows[-1]["id"]
+        corpus_index.rebuild(signatures)
+    except Exception as e:
+        print(f"❌ Error loading dedup signatures, deduplicating within this run only: {e}")
+        corpus_index.reset()
 
-    for chunk, embedding in zip(chunks, embeddings):
-        batch_data.append({"doc_id": doc_id, "text": chunk, "embedding": json.dumps(embedding)})
+def delete_document(doc_id):
+    """Removes the ad-hoc rows of one doc_id, e.g. a staged ingest that did not complete."""
+    try:
+        call_with_retries(
+            lambda: supabase.table("documents").delete().eq("doc_id", doc_id).is_("chunk_id", "null").execute(),
+            deadline=Deadline(WRITE_DEADLINE),
+        )
+    except Exception as e:
+        print(f"❌ Error deleting {doc_id}: {e}")
+
+def store_in_supabase(text, filename, max_retries=3, max_memory_mb=MAX_MEMORY_MB):
+    """Replaces the stored text with new text and its embeddings.
+
+    `text` may be a string or an iterable of text pieces (e.g. PDF pages); chunks are
+    embedded and written in batches sized to stay within max_memory_mb. New rows are
+    written under a staging doc_id and the old records are only deleted once every
+    chunk is stored, so a slow or failing extraction never leaves the table empty or
+    half-filled; on failure the staged rows are removed and the old corpus stays.
+    """
+    check_schema()
+    doc_id = hashlib.md5(filename.encode()).hexdigest()
+    staging_id = f"{doc_id}.staging.{uuid.uuid4().hex}"
+    try:
+        try:
+            stats = ingest_chunks(
+                iter_chunks(text), staging_id, embed_model.encode,
+                lambda batch_data: insert_with_retries(batch_data, max_retries),  # Insert in batches of 10
+                max_memory_mb,
+            )
+        except BaseException:
+            delete_document(staging_id)
+            raise
+        stats["replaced"] = not stats["chunks_failed"]
+        if stats["replaced"]:
+            delete_old_data(keep=staging_id)  # ✅ Delete old records only now
+            try:
+                call_with_retries(
+                    lambda: supabase.table("documents").update({"doc_id": doc_id}).eq("doc_id", staging_id).execute(),
+                    deadline=Deadline(WRITE_DEADLINE),
+                )
+            except Exception as e:  # The rows stay searchable under the staging doc_id
+                print(f"❌ Error renaming {staging_id}: {e}")
+        else:
+            print(f"❌ {stats['chunks_failed']} chunks could not be stored, keeping the previous data")
+            delete_document(staging_id)
+    finally:
+        bump_corpus_generation()
+    print(f"🧹 Dedup: dropped {stats['chunks_dropped']}/{stats['chunks']} chunks, "
+          f"{stats['bytes_saved']} bytes, ~{stats['embed_seconds_saved']:.2f}s of embedding")
+    return stats
 
-        if len(batch_data) >= batch_size:
-            insert_with_retries(batch_data, max_retries)
-            batch_data = []  # Reset batch
+def insert_with_retries(batch_data, max_retries=3):
+    """Inserts data into Supabase with retry handling; returns whether the rows were stored."""
+    try:
+        call_with_retries(
+            lambda: supabase.table("documents").insert(batch_data).execute(),
+            retries=max_retries,
+            deadline=Deadline(WRITE_DEADLINE),
+            idempotent=False,  # A timed-out insert may have gone through, retrying could duplicate it
+        )
+        time.sleep(WRITE_PAUSE)  # Prevent API rate limit errors
+        return True
+    except Exception as e:
+        print(f"❌ Error inserting data: {e}")
+        return False
+
+def match_documents(query_embedding, top_k=20, deadline=None):
+    """Returns the top matching document rows for a query embedding.
+
+    Slow searches are hedged with a second request, transient failures are retried
+    within the deadline, and calls fail fast while the circuit breaker is open.
+    """
+    global local_index
+    if LOCAL_INDEX:
+        with local_index_lock:
+            if local_index is None:
+                from snapshot import LocalIndex
+                local_index = LocalIndex(LOCAL_INDEX)
+        return local_index.search(query_embedding, top_k)
+
+    deadline = deadline or Deadline(SEARCH_DEADLINE)
+
+    def rpc():
+        return supabase.rpc(
+            "match_documents",
+            {"query_embedding": query_embedding, "match_count": top_k}
+        ).execute()
 
-    if batch_data:  # Insert remaining data
-        insert_with_retries(batch_data, max_retries)
+    response = call_with_retries(lambda: hedged(rpc, SEARCH_HEDGE_AFTER, deadline), deadline=deadline)
+    return response.data
 
-def insert_with_retries(batch_data, max_retries=3):
-    """Inserts data into Supabase with retry handling."""
-    for attempt in range(max_retries):
-        try:
-            supabase.table("documents").insert(batch_data).execute()
-            time.sleep(2)  # Prevent API rate limit errors
-            return
-        except httpx.RemoteProtocolError:
-            print(f"🔄 Server disconnected, retrying insert... ({attempt + 1}/{max_retries})")
-            time.sleep(5)  # Wait before retrying
-        except Exception as e:
-            print(f"❌ Error inserting data: {e}")
-            break  # Stop retrying if another error occurs
+def fetch_embeddings(ids, deadline=None):
+    """Returns {id: embedding} for stored rows, so callers never re-encode fetched chunks."""
+    deadline = deadline or Deadline(SEARCH_DEADLINE)
+    response = call_with_retries(
+        lambda: supabase.table("documents").select("id,embedding").in_("id", list(ids)).execute(), deadline=deadline
+    )
+    return {str(row["id"]): row["embedding"] for row in response.data}
 
-def search_supabase(query, top_k=20):
+def search_supabase(query, top_k=20, query_embedding=None):
     """Searches Supabase for relevant embeddings and retrieves top results."""
-    query_embedding = embed_model.encode([query]).tolist()[0]
+    if query_embedding is None:
+        query_embedding = embed_model.encode([query]).tolist()[0]
 
     try:
-        response = supabase.rpc(
-            "match_documents",
-            {"query_embedding": query_embedding, "match_count": top_k}
-        ).execute()
+        rows = match_documents(query_embedding, top_k)
 
-        if response.data:
-            contexts = " ".join([item["text"] for item in response.data])
+        if rows:
+            contexts = " ".join([item["text"] for item in rows])
             return {"question": query, "contexts": [contexts]}
         
-    except httpx.RemoteProtocolError:
-        print("🔄 Server disconnected during search, retrying...")
-        time.sleep(5)
-        return search_supabase(query, top_k)  # Retry search once
-
     except Exception as e:
         print(f"❌ Supabase Search Error: {e}")
         return {"question": query, "contexts": ["Error retrieving results."]}
@@ -0,0 +1,203 @@
+"""Per-page PDF extraction: OCR for scanned pages, row-wise text for tables, cached by page hash."""
+
+import hashlib
+import multiprocessing
+import os
+import re
+import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+import fitz  # PyMuPDF for PDF processing
+
+# SQLite file holding extracted text keyed by page hash, so re-uploads skip extraction
+PAGE_CACHE = os.getenv("JSCRAP_PAGE_CACHE", "page_cache.sqlite")
+OCR_WORKERS = int(os.getenv("JSCRAP_OCR_WORKERS", str(os.cpu_count() or 2)))
+OCR_PAGE_SECONDS = float(os.getenv("JSCRAP_OCR_PAGE_SECONDS", "30"))
+OCR_DPI = int(os.getenv("JSCRAP_OCR_DPI", "300"))
+OCR_LANG = os.getenv("JSCRAP_OCR_LANG", "eng")
+# Pages whose images cover this much of the page and whose text layer is shorter than
+# OCR_MIN_CHARS are treated as scans (a stamped page number or header does not count)
+OCR_MIN_CHARS = int(os.getenv("JSCRAP_OCR_MIN_CHARS", "100"))
+OCR_MIN_IMAGE_COVERAGE = 0.5
+CACHE_BATCH = 64  # Pages per cache lookup and per cache write
+# Bump when extraction changes; part of every cache key together with the OCR settings
+EXTRACTOR_VERSION = "tables-v2"
+
+ocr_pool = None
+
+def get_ocr_pool():
+    """Creates the OCR process pool on first use.
+
+    Workers are spawned rather than forked: the parent already runs torch and API
+    threads, and a forked child can inherit one of their locks held forever.
+    """
+    global ocr_pool
+    if ocr_pool is None:
+        ocr_pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return ocr_pool
+
+def connect_cache():
+    conn = sqlite3.connect(PAGE_CACHE, timeout=10)
+    conn.execute("CREATE TABLE IF NOT EXISTS pages (hash TEXT PRIMARY KEY, text TEXT)")
+    return conn
+
+XREF = re.compile(rb"(\d+) 0 R")
+
+def page_resources(doc, page):
+    """Returns the page's /Resources entry, following /Parent when it is inherited."""
+    xref = page.xref
+    while xref:
+        kind, value = doc.xref_get_key(xref, "Resources")
+        if kind != "null":
+            return value
+        kind, value = doc.xref_get_key(xref, "Parent")
+        xref = int(value.split()[0]) if kind == "xref" else 0
+    return ""
+
+def extraction_settings():
+    """Everything besides the page itself that changes the extracted text."""
+    return f"{EXTRACTOR_VERSION}|{OCR_LANG}|{OCR_DPI}|{OCR_MIN_CHARS}|{OCR_MIN_IMAGE_COVERAGE}"
+
+def page_hash(doc, page):
+    """Hashes a page's content streams and every object reachable from its resources.
+
+    Text depends on fonts, images and Form XObjects as much as on the content stream
+    (a page may be nothing but `/fzFrm0 Do`), so all of them are part of the key.
+    """
+    digest = hashlib.sha256(extraction_settings().encode())
+    digest.update(page.read_contents())
+    resources = page_resources(doc, page).encode()
+    digest.update(resources)
+    pending, seen = [int(x) for x in XREF.findall(resources)], set()
+    while pending:
+        xref = pending.pop()
+        if xref in seen:
+            continue
+        seen.add(xref)
+        source = doc.xref_object(xref, compressed=True).encode()
+        digest.update(source)
+        if doc.xref_is_stream(xref):
+            digest.update(doc.xref_stream_raw(xref) or b"")
+        pending.extend(int(x) for x in XREF.findall(source))
+    return digest.hexdigest()
+
+def is_image_only(page):
+    """True for scanned pages: mostly covered by images, with little or no text layer."""
+    if len(page.get_text("text").strip()) >= OCR_MIN_CHARS:
+        return False
+    page_area = abs(page.rect) or 1.0
+    covered = sum(abs(fitz.Rect(info["bbox"]) & page.rect) for info in page.get_image_info())
+    return covered / page_area >= OCR_MIN_IMAGE_COVERAGE
+
+def ocr_image(png_bytes, lang=OCR_LANG, timeout=OCR_PAGE_SECONDS):
+    """Runs Tesseract on a rendered page inside a worker process."""
+    import io
+    import pytesseract
+    from PIL import Image
+
+    try:
+        return pytesseract.image_to_string(Image.open(io.BytesIO(png_bytes)), lang=lang, timeout=timeout)
+    except RuntimeError:  # pytesseract kills Tesseract and raises when the page budget runs out
+        return None
+
+def table_text(table):
+    """Flattens a table into one ' | '-separated line per row."""
+    rows = []
+    for row in table.extract():
+        cells = [" ".join((cell or "").split()) for cell in row]
+        if any(cells):
+            rows.append(" | ".join(cells))
+    return "\n".join(rows)
+
+def has_ruling_lines(page):
+    """True when the page draws lines or rectangles, which table detection looks for."""
+    return any(item[0] in ("l", "re") for path in page.get_cdrawings() for item in path["items"])
+
+def text_with_tables(page):
+    """Returns the page text with tables rendered row by row instead of as scattered cells.
+
+    find_tables costs ~100x plain text extraction, so it only runs on pages with
+    ruling lines; without them it finds no tables anyway.
+    """
+    tables = []
+    if has_ruling_lines(page):
+        try:
+            tables = page.find_tables().tables
+        except Exception:
+            pass
+    if not tables:
+        return page.get_text("text")
+
+    boxes = [fitz.Rect(table.bbox) for table in tables]
+    parts = []  # (top y, text) so tables stay in reading order
+    for x0, y0, x1, y1, text, *_ in page.get_text("blocks"):
+        if not any(box.intersects(fitz.Rect(x0, y0, x1, y1)) for box in boxes):
+            parts.append((y0, text.strip()))
+    for box, table in zip(boxes, tables):
+        parts.append((box.y0, table_text(table)))
+    parts.sort(key=lambda part: part[0])
+    return "\n".join(text for _, text in parts if text)
+
+def lookup_cached(hashes):
+    """Returns {hash: text} for the given page hashes that are already cached."""
+    with closing(connect_cache()) as conn:
+        return dict(conn.execute(
+            f"SELECT hash, text FROM pages WHERE hash IN ({','.join('?' * len(hashes))})", hashes
+        ).fetchall())
+
+def store_cached(pages):
+    with closing(connect_cache()) as conn, conn:
+        conn.executemany("INSERT OR REPLACE INTO pages (hash, text) VALUES (?, ?)", pages)
+
+def extract_pages(data):
+    """Yields the text of every page of a PDF given its bytes, in page order.
+
+    Cached pages are returned as-is; scanned pages are rendered and OCR'd in parallel
+    in the process pool with a per-page time budget; the rest go through table-aware
+    text extraction. Only a window of pages is held at a time: cache lookups and
+    writes go CACHE_BATCH pages at a time and at most 2 * OCR_WORKERS pages wait to
+    be yielded, so memory does not grow with the page count.
+    """
+    doc = fitz.open(stream=data, filetype="pdf")
+    window = deque()  # (number, hash, text or OCR future), oldest first
+    new_pages = []  # Extracted pages not written to the cache yet
+    ahead = 2 * OCR_WORKERS
+
+    def finish(number, digest, result):
+        text = result
+        if not isinstance(result, str):
+            try:
+                text = result.result()
+                if text is None:
+                    print(f"⏱️ OCR ran out of time on page {number + 1}")
+            except Exception as e:
+                print(f"❌ OCR failed on page {number + 1}: {e}")
+                text = None
+            if text is None:  # Timed out or crashed OCR pages are not cached so a re-upload tries again
+                return ""
+        if digest is not None:
+            new_pages.append((digest, text))
+            if len(new_pages) >= CACHE_BATCH:
+                store_cached(new_pages)
+                new_pages.clear()
+        return text
+
+    for start in range(0, len(doc), CACHE_BATCH):
+        pages = [doc[number] for number in range(start, min(start + CACHE_BATCH, len(doc)))]
+        hashes = [page_hash(doc, page) for page in pages]
+        cached = lookup_cached(hashes)
+        for page, digest in zip(pages, hashes):
+            if digest in cached:
+                window.append((page.number, None, cached[digest]))
+            elif is_image_only(page):
+                png = page.get_pixmap(dpi=OCR_DPI).tobytes("png")
+                window.append((page.number, digest, get_ocr_pool().submit(ocr_image, png)))
+            else:
+                window.append((page.number, digest, text_with_tables(page)))
+            while len(window) > ahead or (window and isinstance(window[0][2], str)):
+                yield finish(*window.popleft())
+    while window:
+        yield finish(*window.popleft())
+    if new_pages:
+        store_cached(new_pages)
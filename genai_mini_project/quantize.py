@@ -0,0 +1,126 @@
+"""Compressed in-memory vector index: dimension reduction plus int8/binary quantization.
+
+Search scans the compressed vectors, then rescores the best candidates against the
+full-precision vectors (which may be a read-only np.memmap so they stay on disk).
+"""
+
+import numpy as np
+
+# Rows encoded at once while building
+BLOCK_ROWS = 4096
+# Size of the float32 copy of an int8 block scored at once; small enough to stay in
+# L2 cache, so converting the codes costs less than reading float32 vectors would
+SCORE_BLOCK_BYTES = 512 * 1024
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+class CompressedIndex:
+    """Two-stage cosine search over compressed embeddings.
+
+    reduction: "pca" projects onto the top `dims` principal components of the corpus,
+        "truncate" keeps the first `dims` dimensions (Matryoshka-style), None keeps all.
+    quantization: "int8" stores one signed byte per dimension with a per-dimension
+        scale, "binary" stores one sign bit per dimension (packed into uint64 words
+        for np.bitwise_count), None keeps float32.
+    rescore: how many candidates per requested result the first pass keeps for
+        exact rescoring against the full vectors.
+    """
+
+    def __init__(self, dims=128, reduction="pca", quantization="int8", rescore=4):
+        self.dims = dims
+        self.reduction = reduction
+        self.quantization = quantization
+        self.rescore = rescore
+        self.mean = None
+        self.components = None
+        self.scale = None
+        self.codes = None
+        self.full = None
+        self.ids = None
+
+    def fit(self, vectors):
+        """Learns the projection and quantization scale from a sample of the corpus."""
+        vectors = normalize(vectors)
+        if self.reduction == "pca":
+            self.mean = vectors.mean(axis=0)
+            _, _, vt = np.linalg.svd(vectors - self.mean, full_matrices=False)
+            self.components = vt[:self.dims].T.astype(np.float32)
+        if self.quantization == "int8":
+            reduced = self.reduce(vectors)
+            self.scale = np.maximum(np.abs(reduced).max(axis=0), 1e-6) / 127.0
+        return self
+
+    def reduce(self, vectors, centered=True):
+        """Projects vectors to the reduced space.
+
+        Stored vectors are centered; for PCA, q . x ~= q . mean + (q P) . ((x - mean) P),
+        and q . mean is the same for every x, so an uncentered query ranks correctly.
+        """
+        if self.reduction == "pca":
+            return ((vectors - self.mean) if centered else vectors) @ self.components
+        if self.reduction == "truncate":
+            return normalize(vectors[:, :self.dims])
+        return vectors
+
+    def encode(self, vectors):
+        """Compresses normalized vectors into the index's stored code format."""
+        reduced = self.reduce(vectors)
+        if self.quantization == "int8":
+            return np.clip(np.rint(reduced / self.scale), -127, 127).astype(np.int8)
+        if self.quantization == "binary":
+            bits = np.packbits(reduced > 0, axis=1)
+            bits = np.pad(bits, ((0, 0), (0, -bits.shape[1] % 8)))  # Whole 64-bit words
+            return bits.view(np.uint64)
+        return reduced.astype(np.float32)
+
+    def build(self, vectors, ids=None, fit_sample=20000):
+        """Fits on up to fit_sample vectors and compresses all of them.
+
+        `vectors` are kept as given for rescoring, so pass an np.memmap to leave them on disk.
+        """
+        sample = vectors if len(vectors) <= fit_sample else vectors[
+            np.sort(np.random.default_rng(0).choice(len(vectors), fit_sample, replace=False))
+        ]
+        self.fit(sample)
+        self.codes = np.concatenate([
+            self.encode(normalize(vectors[start:start + BLOCK_ROWS])) for start in range(0, len(vectors), BLOCK_ROWS)
+        ]) if len(vectors) else self.encode(np.zeros((0, vectors.shape[1]), dtype=np.float32))
+        self.full = vectors
+        self.ids = np.arange(len(vectors)) if ids is None else np.asarray(ids)
+        return self
+
+    def first_pass(self, query, count):
+        """Returns row numbers of the `count` best matches by compressed score."""
+        if self.quantization == "binary":
+            code = self.encode(query[None, :])[0]
+            scores = -np.bitwise_count(self.codes ^ code).sum(axis=1, dtype=np.int32)  # Minus Hamming distance
+        elif self.quantization == "int8":
+            reduced = self.reduce(query[None, :], centered=False)[0].astype(np.float32)
+            reduced = reduced * self.scale  # Undo the per-dimension scale on the query side
+            scores = np.empty(len(self.codes), dtype=np.float32)
+            rows = max(1, SCORE_BLOCK_BYTES // (4 * self.codes.shape[1]))
+            for start in range(0, len(self.codes), rows):
+                np.dot(self.codes[start:start + rows].astype(np.float32), reduced, out=scores[start:start + rows])
+        else:
+            scores = self.codes @ self.reduce(query[None, :], centered=False)[0].astype(np.float32)
+        count = min(count, len(scores))
+        top = np.argpartition(-scores, count - 1)[:count] if count else np.array([], dtype=int)
+        return top
+
+    def search(self, query, k=20):
+        """Returns [(id, cosine similarity)] for the k nearest vectors, best first."""
+        if self.codes is None or not len(self.codes):
+            return []
+        query = normalize(query)
+        candidates = np.sort(self.first_pass(query, k * self.rescore))
+        scores = normalize(np.asarray(self.full[candidates], dtype=np.float32)) @ query
+        order = np.argsort(-scores)[:k]
+        return [(self.ids[candidates[i]], float(scores[i])) for i in order]
+
+    def memory_bytes(self):
+        """Bytes held in RAM by the compressed codes and projection (full vectors excluded)."""
+        extra = sum(a.nbytes for a in (self.mean, self.components, self.scale) if a is not None)
+        return self.codes.nbytes + extra
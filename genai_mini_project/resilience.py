@@ -0,0 +1,194 @@
+"""Bounded retries, deadlines, a circuit breaker and hedged requests for Supabase calls."""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import httpx
+
+# Status codes worth retrying; PostgREST errors carry them in APIError.code
+TRANSIENT_CODES = {"408", "429", "500", "502", "503", "504", "520"}
+# Responses sent without running the request (rate limited, database unreachable)
+UNPROCESSED_CODES = {"429", "503"}
+
+class CircuitOpenError(Exception):
+    """Raised without calling the backend while the circuit breaker is open."""
+
+class DeadlineExceeded(Exception):
+    """Raised when a call cannot finish before its deadline."""
+
+class Deadline:
+    """Absolute point in time a whole operation (including retries) must finish by."""
+
+    def __init__(self, seconds):
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return self.remaining() == 0.0
+
+class CircuitBreaker:
+    """Opens after consecutive transient failures and fails fast until reset_timeout passes.
+
+    After the timeout one trial call is let through (half-open); success closes the
+    circuit again, failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self):
+        with self.lock:
+            state = self.state
+            if state == "open" or (state == "half-open" and self.trial_running):
+                raise CircuitOpenError("Supabase circuit is open, failing fast.")
+            if state == "half-open":
+                self.trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+# One breaker for the single Supabase backend
+supabase_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("SUPABASE_BREAKER_FAILURES", "5")),
+    reset_timeout=float(os.getenv("SUPABASE_BREAKER_RESET_SECONDS", "30")),
+)
+
+# Deadline of the Supabase call running on each thread, read by the httpx request hook
+current = threading.local()
+
+def apply_deadline(request):
+    """httpx request hook capping each timeout phase of a request at the current deadline."""
+    deadline = getattr(current, "deadline", None)
+    if deadline is None:
+        return
+    remaining = deadline.remaining()
+    if remaining == 0.0:
+        raise DeadlineExceeded("Deadline exceeded before Supabase call.")
+    timeouts = request.extensions.get("timeout") or {}
+    request.extensions["timeout"] = {
+        phase: remaining if seconds is None else min(seconds, remaining) for phase, seconds in timeouts.items()
+    } or httpx.Timeout(remaining).as_dict()
+
+def enforce_deadlines(client):
+    """Makes a Supabase client's HTTP requests give up when the calling operation's deadline does.
+
+    Without this a hung request blocks for the client's own timeout (120 s by default),
+    however little time its deadline has left.
+    """
+    client.postgrest.session.event_hooks["request"].append(apply_deadline)
+
+def with_deadline(func, deadline):
+    """Wraps func so the HTTP requests it makes, on whatever thread runs it, honour deadline."""
+    def run():
+        previous = getattr(current, "deadline", None)
+        current.deadline = deadline
+        try:
+            return func()
+        finally:
+            current.deadline = previous
+    return run
+
+def is_transient(error):
+    """True for disconnects, timeouts and 5xx/429 responses."""
+    if isinstance(error, (httpx.TransportError, DeadlineExceeded)):
+        return True
+    return str(getattr(error, "code", "")) in TRANSIENT_CODES
+
+def was_not_processed(error):
+    """True when the failed request certainly did not reach the database.
+
+    A read timeout or a dropped connection may come after the server ran the request,
+    so only failures to connect and explicit refusals count.
+    """
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, DeadlineExceeded)):
+        return True
+    return str(getattr(error, "code", "")) in UNPROCESSED_CODES
+
+def call_with_retries(func, retries=3, deadline=None, backoff=0.5, max_backoff=8.0, breaker=supabase_breaker,
+                      idempotent=True):
+    """Calls func() with bounded, jittered exponential backoff on transient errors.
+
+    Gives up early when the next wait would overrun the deadline, and each attempt's
+    HTTP requests time out with the deadline (see enforce_deadlines). Non-transient
+    errors are raised immediately and do not count against the breaker. Calls that
+    must not run twice (idempotent=False, e.g. inserts) are only retried when the
+    failed attempt was not processed.
+    """
+    if deadline is not None:
+        func = with_deadline(func, deadline)
+    for attempt in range(retries):
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceeded("Deadline exceeded before Supabase call.")
+        breaker.before_call()
+        try:
+            result = func()
+        except Exception as e:
+            if not is_transient(e):
+                breaker.record_success()  # The backend answered, it is just a bad request
+                raise
+            breaker.record_failure()
+            if attempt + 1 == retries or not (idempotent or was_not_processed(e)):
+                raise
+            delay = random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+            if deadline is not None and delay >= deadline.remaining():
+                raise
+            print(f"🔄 Supabase call failed ({e.__class__.__name__}), retrying... ({attempt + 1}/{retries})")
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+# Shared pool for hedged requests so waiting on a slow call does not block the caller past its deadline
+hedge_pool = ThreadPoolExecutor(max_workers=int(os.getenv("SUPABASE_HEDGE_WORKERS", "8")))
+
+def hedged(func, hedge_after=0.5, deadline=None):
+    """Calls func() and, if it has not answered after hedge_after seconds, races a second call.
+
+    Returns the first successful result; raises the last error if both fail and
+    DeadlineExceeded if neither finishes in time.
+    """
+    if deadline is not None:
+        func = with_deadline(func, deadline)  # Hung calls then free their pool thread at the deadline
+    timeout = deadline.remaining() if deadline is not None else None
+    futures = {hedge_pool.submit(func)}
+    done, _ = wait(futures, timeout=min(hedge_after, timeout) if timeout is not None else hedge_after)
+    if not done:
+        futures.add(hedge_pool.submit(func))
+    error = None
+    while futures:
+        timeout = deadline.remaining() if deadline is not None else None
+        done, futures = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            raise DeadlineExceeded("Supabase call did not finish before its deadline.")
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+    raise error
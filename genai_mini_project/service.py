@@ -0,0 +1,98 @@
+"""Service layer shared by the CLI, the HTTP API and the Streamlit apps."""
+
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from context_cache import ContextCache
+from scrap import scrape_website
+from pdf import embed_model, search_supabase, store_in_supabase
+from pdf_extract import extract_pages
+from llm import get_gemini_response
+
+try:
+    import fcntl
+except ImportError:  # Windows: only ingests within one process are serialized
+    fcntl = None
+
+# store_in_supabase replaces the whole documents table, so ingests must not interleave,
+# neither between threads nor between processes (API workers, CLI runs) on this host.
+# Processes on different hosts do not share this file, so ingest from one host only.
+INGEST_LOCK_FILE = os.getenv("JSCRAP_INGEST_LOCK", os.path.join(tempfile.gettempdir(), "jscrap_ingest.lock"))
+thread_lock = threading.Lock()
+
+@contextmanager
+def ingest_lock():
+    """Holds the ingest lock for this process and, via flock on INGEST_LOCK_FILE, for the host."""
+    with thread_lock, open(INGEST_LOCK_FILE, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
+
+# Per-conversation retrieval caches, least recently used evicted first
+MAX_SESSIONS = 1000
+sessions = OrderedDict()
+sessions_lock = threading.Lock()
+
+def get_session(session_id):
+    """Returns the context cache for a conversation, creating it if needed."""
+    with sessions_lock:
+        cache = sessions.pop(session_id, None) or ContextCache()
+        sessions[session_id] = cache
+        while len(sessions) > MAX_SESSIONS:
+            sessions.popitem(last=False)
+        return cache
+
+def ingest_text(text, source):
+    """Stores already extracted text (a string or an iterable of pieces) under the given source name."""
+    with ingest_lock():
+        stats = store_in_supabase(text, source)  # Bumps the corpus generation, so caches drop old chunks
+    return {"source": source, **stats}
+
+def ingest_url(url):
+    """Scrapes a website and stores its text in Supabase."""
+    return ingest_text(scrape_website(url), url)
+
+def ingest_pdf(data, filename):
+    """Extracts text from raw PDF bytes and stores it in Supabase, one page at a time."""
+    pages = extract_pages(data)  # A generator, so pages are chunked and embedded as they are extracted
+    return ingest_text((page + "\n" for page in pages), filename)
+
+def answer(question, contexts):
+    """Asks Gemini to answer a question from retrieved contexts."""
+    response = get_gemini_response(" ".join(contexts), question)
+    return {"question": question, "answer": response}
+
+def ask(question, top_k=20, session_id=None):
+    """Retrieves context for a question and answers it.
+
+    With a session_id, retrieval goes through that conversation's ContextCache so
+    follow-up questions reuse chunks fetched in earlier turns.
+    """
+    if session_id is None:
+        result = search_supabase(question, top_k)
+        return answer(result["question"], result["contexts"])
+    try:
+        result = get_session(session_id).retrieve(question, top_k)
+    except Exception as e:
+        print(f"❌ Supabase Search Error: {e}")
+        return answer(question, ["Error retrieving results."])
+    return answer(question, result["contexts"] or ["No relevant information found."])
+
+def session_stats(session_id):
+    """Returns retrieval counters for a conversation."""
+    with sessions_lock:
+        cache = sessions.get(session_id)
+    return dict(cache.stats) if cache else None
+
+def ask_batch(questions, top_k=20):
+    """Answers several questions, embedding them in a single model call."""
+    if not questions:
+        return []
+    embeddings = embed_model.encode(questions).tolist()
+    results = []
+    for question, query_embedding in zip(questions, embeddings):
+        result = search_supabase(question, top_k, query_embedding)
+        results.append(answer(result["question"], result["contexts"]))
+    return results
@@ -0,0 +1,194 @@
+"""Export and import of the documents index as columnar snapshots.
+
+A snapshot holds doc_id, chunk_id, text, the dedup simhash and the embedding as a
+fixed-size list of float32, so restoring never touches the embedding model:
+
+- `.parquet` files are compressed (zstd) and best for moving corpora around.
+- `.arrow` files (Arrow IPC, uncompressed) can be memory-mapped, so a local index
+  over millions of chunks loads without copying the vectors into RAM.
+
+Import either bulk-loads into Postgres with COPY (when DATABASE_URL is set), falls
+back to large PostgREST batches, or builds a local CompressedIndex for search.
+"""
+
+import json
+import os
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from quantize import CompressedIndex
+from resilience import Deadline, call_with_retries
+
+EXPORT_PAGE = 1000  # Rows fetched from Supabase per request
+IMPORT_BATCH = 500  # Rows per PostgREST insert when COPY is not available
+
+def snapshot_schema(dims):
+    return pa.schema([
+        ("doc_id", pa.string()),
+        ("chunk_id", pa.string()),
+        ("text", pa.string()),
+        ("simhash", pa.string()),
+        ("embedding", pa.list_(pa.float32(), dims)),
+    ])
+
+def rows_to_batch(rows, dims):
+    """Converts Supabase rows into an Arrow record batch with float32 vectors."""
+    vectors = np.asarray(
+        [json.loads(row["embedding"]) if isinstance(row["embedding"], str) else row["embedding"] for row in rows],
+        dtype=np.float32,
+    ).reshape(-1, dims)
+    return pa.record_batch([
+        pa.array([row["doc_id"] for row in rows], pa.string()),
+        pa.array([row.get("chunk_id") for row in rows], pa.string()),
+        pa.array([row["text"] for row in rows], pa.string()),
+        pa.array([row.get("simhash") for row in rows], pa.string()),
+        pa.FixedSizeListArray.from_arrays(pa.array(vectors.ravel(), pa.float32()), dims),
+    ], schema=snapshot_schema(dims))
+
+def open_writer(path, schema):
+    if path.endswith(".arrow"):
+        return pa.ipc.new_file(path, schema)
+    return pq.ParquetWriter(path, schema, compression="zstd")
+
+def export_snapshot(path, doc_id=None):
+    """Streams the documents table (or one document) into a snapshot file; returns the row count."""
+    from pdf import supabase
+
+    writer, last_id, total = None, 0, 0
+    while True:
+        query = supabase.table("documents").select("*").gt("id", last_id).order("id").limit(EXPORT_PAGE)
+        if doc_id:
+            query = query.eq("doc_id", doc_id)
+        rows = call_with_retries(query.execute, deadline=Deadline(60)).data
+        if not rows:
+            break
+        embedding = rows[0]["embedding"]
+        dims = len(json.loads(embedding) if isinstance(embedding, str) else embedding)
+        batch = rows_to_batch(rows, dims)
+        if writer is None:
+            writer = open_writer(path, batch.schema)
+        writer.write_batch(batch)
+        total += len(rows)
+        last_id = rows[-1]["id"]
+        print(f"📦 Exported {total} rows...")
+    if writer is not None:
+        writer.close()
+    return total
+
+def read_snapshot(path):
+    """Returns the snapshot as an Arrow table, memory-mapped when it is an .arrow file."""
+    if path.endswith(".arrow"):
+        return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return pq.read_table(path)
+
+class ChunkedMatrix:
+    """Read-only (n, dims) float32 matrix over the record batches of an embedding column.
+
+    Each batch is a zero-copy NumPy view, so for a memory-mapped .arrow file the
+    vectors stay in the page cache instead of being copied into one big array.
+    """
+
+    def __init__(self, column):
+        self.dims = column.type.list_size
+        self.blocks = [chunk.flatten().to_numpy().reshape(-1, self.dims) for chunk in column.chunks]
+        self.offsets = np.cumsum([0] + [len(block) for block in self.blocks])
+        self.shape = (int(self.offsets[-1]), self.dims)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        if isinstance(rows, slice):
+            rows = np.arange(*rows.indices(len(self)))
+        rows = np.asarray(rows)
+        block = np.searchsorted(self.offsets, rows, side="right") - 1
+        out = np.empty((len(rows), self.dims), dtype=np.float32)
+        for n in np.unique(block):
+            mask = block == n
+            out[mask] = self.blocks[n][rows[mask] - self.offsets[n]]
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        return self[:] if dtype is None else self[:].astype(dtype)
+
+def iter_batches(path, size=IMPORT_BATCH):
+    if path.endswith(".arrow"):
+        yield from read_snapshot(path).to_batches(max_chunksize=size)
+    else:
+        yield from pq.ParquetFile(path).iter_batches(batch_size=size)
+
+def batch_rows(batch):
+    """Yields (doc_id, chunk_id, text, simhash, float32 vector) tuples from a snapshot batch."""
+    vectors = batch.column("embedding").flatten().to_numpy().reshape(len(batch), -1)
+    simhashes = batch.column("simhash").to_pylist() if "simhash" in batch.schema.names else [None] * len(batch)
+    yield from zip(
+        batch.column("doc_id").to_pylist(), batch.column("chunk_id").to_pylist(),
+        batch.column("text").to_pylist(), simhashes, vectors,
+    )
+
+def pgvector_literal(vector):
+    return "[" + ",".join(f"{x:.8g}" for x in vector) + "]"
+
+def import_with_copy(path, database_url):
+    """Bulk-loads a snapshot with Postgres COPY, the fastest path into Supabase."""
+    import psycopg
+
+    total = 0
+    with psycopg.connect(database_url) as conn, conn.cursor() as cursor:
+        with cursor.copy("COPY documents (doc_id, chunk_id, text, simhash, embedding) FROM STDIN") as copy:
+            for batch in iter_batches(path, 10000):
+                for doc_id, chunk_id, text, simhash, vector in batch_rows(batch):
+                    copy.write_row((doc_id, chunk_id, text, simhash, pgvector_literal(vector)))
+                total += len(batch)
+                print(f"📥 Copied {total} rows...")
+    return total
+
+def import_with_rest(path):
+    """Loads a snapshot through PostgREST in large batches when no database URL is available."""
+    from pdf import check_schema, supabase
+
+    check_schema()
+    total = 0
+    for batch in iter_batches(path):
+        rows = []
+        for doc_id, chunk_id, text, simhash, vector in batch_rows(batch):
+            row = {"doc_id": doc_id, "text": text, "simhash": simhash, "embedding": pgvector_literal(vector)}
+            if chunk_id is not None:
+                row["chunk_id"] = chunk_id
+            rows.append(row)
+        call_with_retries(
+            lambda: supabase.table("documents").insert(rows).execute(), deadline=Deadline(120), idempotent=False
+        )
+        total += len(rows)
+        print(f"📥 Inserted {total} rows...")
+    return total
+
+def import_snapshot(path):
+    """Bulk-loads a snapshot into Supabase without re-embedding; returns the row count."""
+    database_url = os.getenv("DATABASE_URL")
+    if database_url:
+        return import_with_copy(path, database_url)
+    return import_with_rest(path)
+
+class LocalIndex:
+    """Searchable in-process copy of a snapshot, returning rows shaped like match_documents."""
+
+    def __init__(self, path, **index_options):
+        self.table = read_snapshot(path)
+        self.vectors = ChunkedMatrix(self.table.column("embedding"))
+        self.index = CompressedIndex(**index_options).build(self.vectors)
+
+    def search(self, query_embedding, top_k=20):
+        """Returns the top_k rows with their stored embedding, so callers need not re-encode them."""
+        rows = []
+        for row, score in self.index.search(np.asarray(query_embedding, dtype=np.float32), top_k):
+            row = int(row)
+            rows.append({
+                "id": row,  # Row number in the snapshot, not the Supabase id
+                "doc_id": self.table.column("doc_id")[row].as_py(),
+                "chunk_id": self.table.column("chunk_id")[row].as_py(),
+                "text": self.table.column("text")[row].as_py(),
+                "embedding": self.vectors[[row]][0],
+                "similarity": score,
+            })
+        return rows
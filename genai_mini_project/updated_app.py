@@ -1,7 +1,7 @@
+import uuid
 import streamlit as st
-from scrap import scrape_website
-from pdf import search_supabase, store_in_supabase, extract_text_from_pdf
-from llm import get_gemini_response
+import client
+from history import HistoryStore, user_key
 
 def set_bg():
     """Sets custom background styling."""
@@ -49,25 +49,22 @@ def set_bg():
 
 def initialize_session_state():
     """Initializes session state variables separately for Web URL and PDF Upload."""
-    if "web_questions" not in st.session_state:
-        st.session_state.web_questions = []
-    if "web_answers" not in st.session_state:
-        st.session_state.web_answers = []
-    if "pdf_questions" not in st.session_state:
-        st.session_state.pdf_questions = []
-    if "pdf_answers" not in st.session_state:
-        st.session_state.pdf_answers = []
+    if "user_id" not in st.session_state:
+        st.session_state.user_id = user_key(st.query_params)  # Keys this user's history across reloads
+    if "web_history" not in st.session_state:
+        st.session_state.web_history = HistoryStore(f"web:{st.session_state.user_id}")
+    if "pdf_history" not in st.session_state:
+        st.session_state.pdf_history = HistoryStore(f"pdf:{st.session_state.user_id}")
+    if "session_ids" not in st.session_state:
+        # Separate conversation ids so follow-ups only reuse context from the same mode
+        st.session_state.session_ids = {"Web URL": str(uuid.uuid4()), "PDF Upload": str(uuid.uuid4())}
     if "current_mode" not in st.session_state:
         st.session_state.current_mode = "Web URL"
 
 def clear_history(mode):
     """Clears stored questions and answers based on mode."""
-    if mode == "Web URL":
-        st.session_state.web_questions = []
-        st.session_state.web_answers = []
-    else:
-        st.session_state.pdf_questions = []
-        st.session_state.pdf_answers = []
+    get_history(mode).clear()
+    st.session_state.session_ids[mode] = str(uuid.uuid4())
     st.success("Chat history cleared!")
 
 def main():
@@ -97,8 +94,8 @@ def handle_web_url():
         if st.button("🕵️‍♂️ Scrape Webpage"):
             if url:
                 st.success(f"🔄 Scraping started for: {url}")
-                scraped_text = scrape_website(url)
-                store_in_supabase(scraped_text, url)
+                client.ingest_url(url)
+                st.session_state.session_ids["Web URL"] = str(uuid.uuid4())  # Cached chunks belong to the replaced corpus
             else:
                 st.error("❌ Please enter a valid URL.")
     handle_question_answering("Web URL")
@@ -110,10 +107,13 @@ def handle_pdf_upload():
     
     if uploaded_file is not None:
         st.success("📄 PDF uploaded successfully!")
-        with st.spinner("Processing PDF..."):
-            text = extract_text_from_pdf(uploaded_file)
-            store_in_supabase(text, uploaded_file.name)
-            st.success("PDF text extracted and stored in Supabase!")
+        upload = (uploaded_file.name, uploaded_file.size)
+        if st.session_state.get("ingested_pdf") != upload:  # Streamlit reruns this on every interaction
+            with st.spinner("Processing PDF..."):
+                client.ingest_pdf(uploaded_file.getvalue(), uploaded_file.name)
+            st.session_state.ingested_pdf = upload
+            st.session_state.session_ids["PDF Upload"] = str(uuid.uuid4())  # Cached chunks belong to the replaced corpus
+        st.success("PDF text extracted and stored in Supabase!")
     handle_question_answering("PDF Upload")
 
 def handle_question_answering(mode):
@@ -129,19 +129,11 @@ def handle_question_answering(mode):
     
     if submit_pressed:
         if user_question:
-            with st.spinner("Searching relevant context..."):
-                result = search_supabase(user_question)
-                question, contexts = result["question"], result["contexts"]
+            with st.spinner("Searching relevant context and generating answer..."):
+                result = client.ask(user_question, session_id=st.session_state.session_ids[mode])
+                question, response = result["question"], result["answer"]
             
-            with st.spinner("Generating answer..."):
-                response = get_gemini_response(question, contexts)
-            
-            if mode == "Web URL":
-                st.session_state.web_questions.insert(0, question)
-                st.session_state.web_answers.insert(0, response)
-            else:
-                st.session_state.pdf_questions.insert(0, question)
-                st.session_state.pdf_answers.insert(0, response)
+            get_history(mode).add(question, response)
             
             st.write(f"🤔 *You asked:* {question}")
             st.write(f"📝 *Answer:* {response}")
@@ -151,15 +143,22 @@ def handle_question_answering(mode):
     if clear_pressed:
         clear_history(mode)
     
-    if mode == "Web URL" and st.session_state.web_questions:
-        display_history(st.session_state.web_questions, st.session_state.web_answers)
-    elif mode == "PDF Upload" and st.session_state.pdf_questions:
-        display_history(st.session_state.pdf_questions, st.session_state.pdf_answers)
+    history = get_history(mode)
+    if len(history):
+        display_history(history)
+
+def get_history(mode):
+    """Returns the history store for a mode."""
+    return st.session_state.web_history if mode == "Web URL" else st.session_state.pdf_history
 
-def display_history(questions, answers):
-    """Displays previous questions and answers."""
+def display_history(history, page_size=10):
+    """Displays previous questions and answers one page at a time."""
     st.subheader("📜 Previous Questions")
-    for q, a in zip(questions, answers):
+    pages = history.page_count(page_size)
+    page = 1
+    if pages > 1:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, key=f"{history.key}_page")
+    for q, a in history.page(page - 1, page_size):
         st.write(f"**Q:** {q}")
         st.write(f"**A:** {a}")
         st.write("---")